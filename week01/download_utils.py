@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# read the umask once, changing it from the download threads would race with other file creation
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+class ImageStore:
+    """Content-addressed image store with an index mapping url -> digest -> path"""
+
+    def __init__(self, folder, index_file='index.json'):
+        self.folder = folder
+        self.index_path = os.path.join(folder, index_file)
+        self._lock = threading.Lock()
+
+        # urls: url -> {digest, etag, last_modified}, digests: digest -> saved path
+        self.index = {'urls': {}, 'digests': {}}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='UTF-8') as f:
+                self.index.update(json.load(f))
+
+    def lookup(self, url):
+        """Return the saved path for a url, or None if it is unknown or missing on disk"""
+        with self._lock:
+            entry = self.index['urls'].get(url)
+            if entry is None:
+                return None
+
+            path = self.index['digests'].get(entry['digest'])
+            if path is None or not os.path.exists(path):
+                return None
+
+            return path
+
+    def conditional_headers(self, url):
+        """Build If-None-Match / If-Modified-Since headers for a previously stored url"""
+        if self.lookup(url) is None:
+            return {}
+
+        entry = self.index['urls'][url]
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def add(self, url, part_path, digest, save_path, etag=None, last_modified=None):
+        """Move a finished download into the store, returns (path, is_duplicate)"""
+        with self._lock:
+            path = self.index['digests'].get(digest)
+            duplicate = path is not None and os.path.exists(path)
+
+            if duplicate:
+                # identical bytes are already on disk, drop the new copy
+                os.remove(part_path)
+            else:
+                path = save_path
+                os.replace(part_path, path)
+                self.index['digests'][digest] = path
+
+            self.index['urls'][url] = {
+                'digest': digest,
+                'etag': etag,
+                'last_modified': last_modified
+            }
+            return path, duplicate
+
+    def save(self):
+        """Write the index atomically"""
+        tmp_path = self.index_path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w', encoding='UTF-8') as f:
+                json.dump(self.index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+
+class ImageDownloader:
+    """Bounded-concurrency image downloader with one pooled session per host"""
+
+    def __init__(self, referer=None, max_workers=16, max_per_host=6, chunk_size=64 * 1024, timeout=30, store=None):
+        self.referer = referer
+        self.store = store
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+
+        # one session (and connection pool) plus one slot semaphore per host
+        self._sessions = {}
+        self._host_slots = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get_session(self, url):
+        """Return the pooled session and the in-flight limiter for the url's host"""
+        host = urllib.parse.urlparse(url).netloc
+
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                session.headers['User-Agent'] = USER_AGENT
+                if self.referer:
+                    session.headers['Referer'] = self.referer
+
+                # keep at most max_per_host connections alive for this host
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_per_host)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+
+                self._sessions[host] = session
+                self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+
+            return self._sessions[host], self._host_slots[host]
+
+    def download(self, img_url, save_path):
+        """Stream a single image to disk, returns (saved_path, status)
+
+        status is one of 'downloaded', 'duplicate', 'unchanged' or 'failed'
+        """
+        session, slot = self._get_session(img_url)
+
+        # ask the server to skip the body if we already hold this url
+        headers = self.store.conditional_headers(img_url) if self.store else {}
+
+        with slot:
+            # write to a temporary file so an interrupted download never looks finished
+            fd, part_path = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(save_path) or '.')
+            os.close(fd)
+
+            # mkstemp creates private files, give the image the usual permissions
+            os.chmod(part_path, 0o666 & ~_UMASK)
+
+            try:
+                with session.get(img_url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 304:
+                        os.remove(part_path)
+                        return self.store.lookup(img_url), 'unchanged'
+
+                    response.raise_for_status()
+
+                    # hash while streaming so the bytes are only read once
+                    digest = hashlib.sha256()
+                    with open(part_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            digest.update(chunk)
+                            f.write(chunk)
+
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+
+                if self.store is None:
+                    os.replace(part_path, save_path)
+                    return save_path, 'downloaded'
+
+                path, duplicate = self.store.add(img_url, part_path, digest.hexdigest(), save_path,
+                                                 etag=etag, last_modified=last_modified)
+                return path, 'duplicate' if duplicate else 'downloaded'
+
+            except Exception as e:
+                print(f"Failed to download image {img_url}: {e}")
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                return None, 'failed'
+
+    def download_all(self, jobs):
+        """Download (img_url, save_path) jobs concurrently, yields (job, (saved_path, status)) as each finishes"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.download, job[0], job[1]): job for job in jobs}
+
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def close(self):
+        """Close every pooled session"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._host_slots.clear()
@@ -6,6 +6,7 @@ import os
 import datetime
 import urllib.parse
 from pathlib import Path
+from download_utils import ImageDownloader, ImageStore
 
 # load the environment variables
 dotenv.load_dotenv()
@@ -15,6 +16,8 @@ year = int(os.getenv('YEAR', 2024))
 url = os.getenv('URL')
 filename = os.getenv('FILENAME', f"crawled-page-{year}.html")
 image_folder = os.getenv('IMAGE_FOLDER', 'images')
+max_workers = int(os.getenv('MAX_WORKERS', 16))
+max_per_host = int(os.getenv('MAX_PER_HOST', 6))
 
 print(f"Scraping page: {url}")
 print(f"Saving HTML file: {filename}")
@@ -63,26 +66,12 @@ images = tree.xpath('//img[@src]')
 
 print(f"Found {len(images)} image elements")
 
-# function to download image
-def download_image(img_url, save_path):
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Referer': url
-        }
-        response = requests.get(img_url, headers=headers, stream=True)
-        response.raise_for_status()
-        
-        with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        return True
-    except Exception as e:
-        print(f"Failed to download image {img_url}: {e}")
-        return False
+# collect the download jobs first so they can run concurrently
+jobs = []
+
+# file names already taken by a queued job
+reserved_paths = set()
 
-# download each image
 for i, img in enumerate(images):
     src = img.get('src')
     alt = img.get('alt', f'image_{i}')
@@ -130,25 +119,46 @@ for i, img in enumerate(images):
     # handle duplicate filenames
     counter = 1
     original_save_path = save_path
-    while os.path.exists(save_path):
+    while os.path.exists(save_path) or save_path in reserved_paths:
         name, ext = os.path.splitext(original_save_path)
         save_path = f"{name}_{counter}{ext}"
         counter += 1
-    
-    print(f"Downloading: {img_url}")
-    print(f"Saving as: {save_path}")
-    
-    if download_image(img_url, save_path):
-        downloaded_images.append({
-            'url': img_url,
-            'alt': alt,
-            'saved_path': save_path
-        })
-        print(f"Success")
-    else:
-        print(f"Failed")
-    
-    print("-" * 50)
+
+    reserved_paths.add(save_path)
+    jobs.append((img_url, save_path, alt))
+
+print(f"Downloading {len(jobs)} images ({max_workers} workers, {max_per_host} per host)")
+
+# content-addressed store, identical images are only kept once across runs
+store = ImageStore(image_folder)
+
+# download the images concurrently, reusing one connection pool per host
+with ImageDownloader(referer=url, max_workers=max_workers, max_per_host=max_per_host, store=store) as downloader:
+    for (img_url, _, alt), (saved_path, status) in downloader.download_all(jobs):
+        print(f"Downloading: {img_url}")
+
+        if saved_path:
+            print(f"Saved as: {saved_path}")
+            downloaded_images.append({
+                'url': img_url,
+                'alt': alt,
+                'saved_path': saved_path
+            })
+
+        match status:
+            case 'downloaded':
+                print(f"Success")
+            case 'duplicate':
+                print(f"Identical image already stored, skipped")
+            case 'unchanged':
+                print(f"Not modified since last crawl, skipped")
+            case _:
+                print(f"Failed")
+
+        print("-" * 50)
+
+# persist the url -> digest -> path index for the next crawl
+store.save()
 
 print(f"\nSummary:")
 print(f"Successfully downloaded {len(downloaded_images)} images")
@@ -0,0 +1,178 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import GifImagePlugin, Image
+
+
+class FrameRenderer:
+    """Render frames of a scene into raw RGBA buffers, drawing the static background only once
+
+    scene_factory(*args) must return (fig, update, init) like a FuncAnimation with blit=True:
+    init() and update(frame) return the animated artists.
+    """
+
+    def __init__(self, scene_factory, args=()):
+        self.fig, self.update, init = scene_factory(*args)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.size = self.canvas.get_width_height()
+
+        # draw everything except the animated artists and keep it as background
+        artists = init()
+        for artist in artists:
+            artist.set_visible(False)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in artists:
+            artist.set_visible(True)
+
+    def render(self, frame):
+        """Return the RGBA bytes of a single frame"""
+        self.canvas.restore_region(self.background)
+
+        # draw in the same order a full redraw would
+        for artist in sorted(self.update(frame), key=lambda artist: artist.get_zorder()):
+            artist.axes.draw_artist(artist)
+
+        return bytes(self.canvas.buffer_rgba())
+
+    def close(self):
+        import matplotlib.pyplot as plt
+        plt.close(self.fig)
+
+
+class GifFrameEncoder:
+    """Quantize RGBA frames to a fixed palette and LZW encode them as GIF frame blocks"""
+
+    def __init__(self, size, fps, palette_rgba):
+        self.size = size
+        self.duration = int(round(1000 / fps))
+
+        # the palette comes from one representative (usually the busiest) frame
+        self.palette = self._image(palette_rgba).quantize(256)
+
+    def _image(self, rgba):
+        return Image.frombuffer('RGBA', self.size, rgba, 'raw', 'RGBA', 0, 1).convert('RGB')
+
+    def header(self):
+        header, _ = GifImagePlugin.getheader(self.palette.copy(), info={'loop': 0, 'duration': self.duration})
+        return b''.join(header)
+
+    def encode(self, rgba):
+        indexed = self._image(rgba).quantize(palette=self.palette, dither=Image.Dither.NONE)
+        return b''.join(GifImagePlugin.getdata(indexed, duration=self.duration))
+
+
+class RawFrameEncoder:
+    """Pass RGBA frames through unchanged, for encoders that take raw video"""
+
+    def encode(self, rgba):
+        return rgba
+
+
+class GifStreamWriter:
+    """Incremental GIF writer, every encoded frame goes straight to the file"""
+
+    def __init__(self, filename, size, fps, palette_rgba):
+        self.encoder = GifFrameEncoder(size, fps, palette_rgba)
+        self.file = open(filename, 'wb')
+        self.file.write(self.encoder.header())
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        # gif trailer
+        self.file.write(b';')
+        self.file.close()
+
+
+class FFmpegWriter:
+    """Pipe raw RGBA frames into an ffmpeg process (mp4, webm, ...)"""
+
+    CODECS = {
+        '.webm': ['-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', '32'],
+        '.mp4': ['-c:v', 'libx264', '-preset', 'fast', '-crf', '20'],
+    }
+
+    def __init__(self, filename, size, fps):
+        if shutil.which('ffmpeg') is None:
+            raise RuntimeError("ffmpeg is needed to export video, install it or export a .gif")
+
+        self.encoder = RawFrameEncoder()
+        width, height = size
+        codec = self.CODECS.get(os.path.splitext(filename)[1].lower(), [])
+        self.process = subprocess.Popen(
+            ['ffmpeg', '-y', '-loglevel', 'error',
+             '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+             # yuv420p needs even dimensions
+             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', *codec, filename],
+            stdin=subprocess.PIPE)
+
+    def write(self, data):
+        self.process.stdin.write(data)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self.process.returncode}")
+
+
+def open_writer(filename, renderer, frames, fps):
+    """Pick the writer from the file extension"""
+    if filename.lower().endswith('.gif'):
+        return GifStreamWriter(filename, renderer.size, fps, renderer.render(frames - 1))
+    return FFmpegWriter(filename, renderer.size, fps)
+
+
+def _use_agg_backend():
+    """Worker initializer, render off-screen"""
+    matplotlib.use('Agg')
+
+
+def _render_chunk(scene_factory, args, frames, encoder):
+    """Render and encode a chunk of frames in a worker process"""
+    renderer = FrameRenderer(scene_factory, args)
+    try:
+        return [encoder.encode(renderer.render(frame)) for frame in frames]
+    finally:
+        renderer.close()
+
+
+def export_animation(scene_factory, args, frames, filename, fps=10, workers=1, chunk_size=10):
+    """Render frames and stream them straight into the encoder for filename
+
+    Frames are never all held in memory. With workers > 1 chunks of frames are rendered
+    and encoded in parallel processes (scene_factory must be picklable, i.e. a module
+    level function) and written in order, with at most two chunks per worker in flight.
+    """
+    renderer = FrameRenderer(scene_factory, args)
+    writer = open_writer(filename, renderer, frames, fps)
+    encoder = writer.encoder
+
+    try:
+        if workers <= 1:
+            for frame in range(frames):
+                writer.write(encoder.encode(renderer.render(frame)))
+            return
+
+        chunks = [range(start, min(start + chunk_size, frames)) for start in range(0, frames, chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg_backend) as pool:
+            pending = []
+            for chunk in chunks:
+                pending.append(pool.submit(_render_chunk, scene_factory, args, chunk, encoder))
+
+                # write finished chunks in order to keep memory bounded
+                while len(pending) >= workers * 2:
+                    for data in pending.pop(0).result():
+                        writer.write(data)
+
+            for future in pending:
+                for data in future.result():
+                    writer.write(data)
+    finally:
+        writer.close()
+        renderer.close()
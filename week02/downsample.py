@@ -0,0 +1,79 @@
+import numpy as np
+
+
+def _as_float(values):
+    """Numeric view of x values, datetimes become nanoseconds"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets, returns the indices of the n_out points that keep the shape
+
+    The first and last points are always kept. Every bucket in between keeps the point that
+    forms the largest triangle with the previously kept point and the average of the next bucket.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = _as_float(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    edges = np.append(edges, n)
+
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # twice the triangle area for every candidate in the bucket
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+
+def minmax_indices(y, n_out):
+    """Min/max decimation, keeps the lowest and highest point of n_out // 2 buckets in time order"""
+    n = len(y)
+    buckets = n_out // 2
+    if n_out >= n or buckets < 1:
+        return np.arange(n)
+
+    # pad to whole buckets so the search is one reshape
+    size = -(-n // buckets)
+    buckets = -(-n // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.nanargmin(padded, axis=1)
+    highs = offsets + np.nanargmax(padded, axis=1)
+
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def downsample(x, y, n_out, method='lttb'):
+    """Indices of at most n_out points of the series, using 'lttb' or 'minmax'"""
+    match method:
+        case 'lttb':
+            return lttb_indices(x, y, n_out)
+        case 'minmax':
+            return minmax_indices(y, n_out)
+        case _:
+            raise ValueError(f"Unknown downsampling method {method!r}")
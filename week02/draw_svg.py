@@ -1,49 +1,64 @@
+import os
 import drawsvg as draw
 import numpy as np
+import pandas as pd
 import math
+from svg_paths import series_to_canvas, tide_path_d
+from tides_store import load_source
+from tide_harmonics import tide_events
 
-def create_flowing_tides_svg():
-    """Create flowing tides SVG animation"""
+# colour schemes: background, three wave layers from front to back, accent
+STYLES = {
+    'ocean': {'background': '#001133', 'waves': ('#00CCFF', '#66DDFF', '#99EEFF'), 'accent': 'cyan'},
+    'sunset': {'background': '#2B0F2E', 'waves': ('#FF8C42', '#FFB26B', '#FFD6A5'), 'accent': '#FFCF56'},
+    'forest': {'background': '#0B1F14', 'waves': ('#3DDC97', '#7AE7B9', '#B8F2D6'), 'accent': '#C6F91F'},
+    'mono': {'background': '#111111', 'waves': ('#FFFFFF', '#BBBBBB', '#777777'), 'accent': '#FFFFFF'},
+}
+
+def create_wave(times, levels, height, color, opacity, stroke_width, max_points=400):
+    """Wave path of a tide series across the canvas, simplified to max_points points"""
+    d = tide_path_d(times, levels, 800, height, -400, -height / 2, max_points)
+    return draw.Path(d=d, fill='none', stroke=color,
+                     stroke_width=stroke_width, opacity=opacity)
+
+def create_flowing_tides_svg(df=None, max_points=400, style='ocean', filename='flowing_tides_enhanced.svg',
+                             subtitle='Hong Kong Tides Data Flow'):
+    """Create flowing tides SVG from the tide series (df, or TIDES_SOURCE / tides.csv)"""
+    colors = STYLES[style]
+    if df is None:
+        df = load_source(os.getenv('TIDES_SOURCE', 'tides.csv'))
+    df = df.sort_values('datetime')
+    
+    times = df['datetime'].to_numpy()
+    levels = pd.Series(df['tide_level'].to_numpy(np.float64), index=df['datetime'])
     
     # Create main canvas
     d = draw.Drawing(800, 600, origin='center')
     
     # Add deep blue background
-    d.append(draw.Rectangle(-400, -300, 800, 600, fill='#001133'))
-    
-    # Create multi-layer waves
-    def create_wave(amplitude, frequency, phase, color, opacity, stroke_width):
-        points = []
-        for x in range(-400, 401, 5):
-            y = amplitude * math.sin(frequency * x * 0.01 + phase)
-            points.extend([x, y])
-        
-        return draw.Lines(*points, close=False, 
-                         fill='none', stroke=color, 
-                         stroke_width=stroke_width, opacity=opacity)
-    
-    # Main wave layers
-    d.append(create_wave(80, 2, 0, '#00CCFF', 0.8, 4))
-    d.append(create_wave(60, 3, 0.5, '#66DDFF', 0.6, 3))
-    d.append(create_wave(40, 4, 1.0, '#99EEFF', 0.4, 2))
-    
-    # Add particle effects (bubbles)
-    for i in range(30):
-        x = np.random.uniform(-380, 380)
-        y = np.random.uniform(-280, 280)
-        radius = np.random.uniform(3, 12)
-        opacity = np.random.uniform(0.2, 0.7)
-        
-        d.append(draw.Circle(x, y, radius, 
-                           fill='white', opacity=opacity,
-                           stroke='cyan', stroke_width=1))
+    d.append(draw.Rectangle(-400, -300, 800, 600, fill=colors['background']))
+    
+    # Wave layers: readings, daily mean and weekly mean
+    front, middle, back = colors['waves']
+    d.append(create_wave(times, levels.to_numpy(), 160, front, 0.8, 4, max_points))
+    d.append(create_wave(times, levels.rolling('1D').mean().to_numpy(), 120, middle, 0.6, 3, max_points))
+    d.append(create_wave(times, levels.rolling('7D').mean().to_numpy(), 80, back, 0.4, 2, max_points))
+    
+    # Bubbles on the 30 highest tides, bigger and brighter the higher the tide
+    x, y = series_to_canvas(times, levels.to_numpy(), 800, 160, -400, -80)
+    highest = np.argsort(levels.to_numpy())[-30:]
+    weight = np.linspace(0, 1, len(highest))
+    for i, w in zip(highest, weight):
+        d.append(draw.Circle(round(x[i], 1), round(y[i] - 20, 1), round(3 + 9 * w, 1), 
+                           fill='white', opacity=round(0.2 + 0.5 * w, 2),
+                           stroke=colors['accent'], stroke_width=1))
     
     # Add title
     d.append(draw.Text('Flowing Tides Visualization', 24, 0, 250, 
                       fill='white', text_anchor='middle', 
                       font_family='Arial', font_weight='bold'))
     
-    d.append(draw.Text('Hong Kong Tides Data Flow', 16, 0, 220, 
+    d.append(draw.Text(subtitle, 16, 0, 220, 
                       fill='#CCCCCC', text_anchor='middle', 
                       font_family='Arial'))
     
@@ -59,56 +74,143 @@ def create_flowing_tides_svg():
     d.append(draw.Circle(-20, -15, 1, fill='black'))
     
     # Save SVG
-    d.save_svg('flowing_tides_enhanced.svg')
-    print("Enhanced SVG saved as 'flowing_tides_enhanced.svg'")
+    d.save_svg(filename)
+    print(f"Enhanced SVG saved as '{filename}'")
+
+def clock_keyframes(events, start, end):
+    """Hand angle and water level keyframes between start and end
+
+    The hand points up at high tide and down at low tide and turns at a constant
+    rate in between, so each half turn takes exactly one rise or fall.
+    Returns (key_times, angles, levels) with key_times from 0 to 1.
+    """
+    times = events['datetime'].to_numpy().astype('datetime64[s]').astype(np.float64)
+    levels = events['tide_level'].to_numpy(np.float64)
+    
+    # highs on whole turns, lows on half turns
+    first_angle = 0 if events['kind'].iloc[0] == 'high' else 180
+    angles = first_angle + 180 * np.arange(len(events))
+    
+    t0 = pd.Timestamp(start).to_datetime64().astype('datetime64[s]').astype(np.float64)
+    t1 = pd.Timestamp(end).to_datetime64().astype('datetime64[s]').astype(np.float64)
+    inside = (times > t0) & (times < t1)
+    keys = np.concatenate([[t0], times[inside], [t1]])
+    
+    return (keys - t0) / (t1 - t0), np.interp(keys, times, angles), np.interp(keys, times, levels)
 
-def create_tide_clock_svg():
-    """Create tide clock SVG"""
-    d = draw.Drawing(400, 400, origin='center')
+def _values(numbers, fmt='{:.2f}'):
+    return ';'.join(fmt.format(number) for number in numbers)
+
+def create_tide_clock_svg(df=None, start=None, days=1, speed=1, style='ocean', filename='tide_clock.svg', tz=None):
+    """Create an animated tide clock SVG for days from start (default now)
+    
+    The next high and low tides come from the data, or from a harmonic model of it
+    when start is past the readings. The hand and the water level are SMIL animations,
+    so the single file runs for the whole period in the browser. speed > 1 plays
+    the period faster and loops it.
+    
+    Times are local times of the data, tz (default TIDE_TZ or Asia/Hong_Kong) gives
+    the zone used for now. At speed 1 a small script jumps the animation to the
+    current time when the file is opened. Browsers do not run scripts of an SVG
+    shown with <img>, there the clock starts at start whenever the page loads.
+    """
+    if df is None:
+        df = load_source(os.getenv('TIDES_SOURCE', 'tides.csv'))
+    colors = STYLES[style]
+    tz = tz or os.getenv('TIDE_TZ', 'Asia/Hong_Kong')
+    if start is None:
+        start = pd.Timestamp.now(tz=tz).tz_localize(None).floor('min')
+    start = pd.Timestamp(start)
+    end = start + pd.Timedelta(days=days)
+    
+    events = tide_events(df, start, end)
+    key_times, angles, levels = clock_keyframes(events, start, end)
+    dur = f'{days * 86400 / speed:g}s'
+    timing = dict(repeatCount='indefinite') if speed > 1 else dict(fill='freeze')
+    
+    d = draw.Drawing(400, 460, origin='center')
     
     # Background
-    d.append(draw.Circle(0, 0, 180, fill='#001122', stroke='#004466', stroke_width=4))
-    
-    # Clock markings
-    for i in range(12):
-        angle = i * 30 * math.pi / 180
+    d.append(draw.Circle(0, 0, 180, fill=colors['background'], stroke=colors['waves'][2], stroke_width=4))
+    
+    # Water level inside the dial, eased like the tide between high and low
+    low, high = df['tide_level'].min(), df['tide_level'].max()
+    heights = 20 + 300 * (levels - low) / (high - low)
+    dial = draw.ClipPath()
+    dial.append(draw.Circle(0, 0, 176))
+    water = draw.Rectangle(-180, round(160 - heights[0], 2), 360, round(heights[0], 2), fill=colors['waves'][0], opacity=0.25,
+                           clip_path=dial)
+    splines = ';'.join(['0.42 0 0.58 1'] * (len(key_times) - 1))
+    water.append_anim(draw.Animate('height', dur, _values(heights), keyTimes=_values(key_times, '{:.5f}'),
+                                   calcMode='spline', keySplines=splines, **timing))
+    water.append_anim(draw.Animate('y', dur, _values(160 - heights), keyTimes=_values(key_times, '{:.5f}'),
+                                   calcMode='spline', keySplines=splines, **timing))
+    d.append(water)
+    
+    # Clock markings, hours after high tide clockwise and before it counter clockwise
+    labels = ['High', '1', '2', '3', '4', '5', 'Low', '5', '4', '3', '2', '1']
+    for i, label in enumerate(labels):
+        angle = (i * 30 - 90) * math.pi / 180
         x1, y1 = 160 * math.cos(angle), 160 * math.sin(angle)
         x2, y2 = 140 * math.cos(angle), 140 * math.sin(angle)
         
-        d.append(draw.Line(x1, y1, x2, y2, stroke='white', stroke_width=2))
+        d.append(draw.Line(round(x1, 1), round(y1, 1), round(x2, 1), round(y2, 1), stroke='white', stroke_width=2))
         
-        # Numbers
-        text_x, text_y = 130 * math.cos(angle), 130 * math.sin(angle)
-        d.append(draw.Text(str(i if i > 0 else 12), 12, text_x, text_y, 
-                          fill='white', text_anchor='middle', font_family='Arial'))
-    
-    # Tide pointer (simulate high tide time)
-    high_tide_angle = 45 * math.pi / 180  # Example angle
-    x_end = 100 * math.cos(high_tide_angle)
-    y_end = 100 * math.sin(high_tide_angle)
-    
-    d.append(draw.Line(0, 0, x_end, y_end, stroke='cyan', stroke_width=6))
-    d.append(draw.Circle(x_end, y_end, 8, fill='cyan'))
+        text_x, text_y = 122 * math.cos(angle), 122 * math.sin(angle)
+        d.append(draw.Text(label, 12, round(text_x, 1), round(text_y, 1), fill='white', 
+                          text_anchor='middle', dominant_baseline='middle', font_family='Arial'))
+    
+    # Tide pointer, turning from high tide at the top to low tide at the bottom
+    hand = draw.Group()
+    hand.append(draw.Line(0, 0, 0, -100, stroke=colors['accent'], stroke_width=6))
+    hand.append(draw.Circle(0, -100, 8, fill=colors['accent']))
+    hand.append_anim(draw.AnimateTransform('rotate', dur, _values(angles, '{:.2f} 0 0'),
+                                           keyTimes=_values(key_times, '{:.5f}'), **timing))
+    d.append(hand)
     
     # Center
     d.append(draw.Circle(0, 0, 10, fill='white'))
     
+    # Next event label, each shown until its tide has passed
+    for i in range(1, len(events)):
+        event = events.iloc[i]
+        shown_from = np.clip((events['datetime'].iloc[i - 1] - start) / (end - start), 0, 1)
+        shown_to = np.clip((event['datetime'] - start) / (end - start), 0, 1)
+        if shown_to <= 0 or shown_from >= 1:
+            continue
+        
+        text = draw.Text(f"Next {event['kind']} tide {event['datetime']:%a %H:%M}, {event['tide_level']:.2f} m",
+                         13, 0, 210, fill='white', text_anchor='middle', font_family='Arial',
+                         opacity=1 if shown_from == 0 else 0)
+        text.append_anim(draw.Animate('opacity', dur, '0;1;0' if shown_from > 0 else '1;0',
+                                      keyTimes=f'0;{shown_from:.5f};{shown_to:.5f}' if shown_from > 0 else f'0;{shown_to:.5f}',
+                                      calcMode='discrete', **timing))
+        d.append(text)
+    
     # Title
-    d.append(draw.Text('Tide Clock', 16, 0, -220, fill='white', 
+    d.append(draw.Text('Tide Clock', 16, 0, -210, fill='white', 
                       text_anchor='middle', font_family='Arial'))
     
-    d.save_svg('tide_clock.svg')
-    print("Tide clock SVG saved as 'tide_clock.svg'")
+    # SMIL starts when the file is loaded, move the timeline to the real time since start
+    if speed == 1:
+        start_ms = start.tz_localize(tz).value // 10**6
+        d.append(draw.Raw('<script>window.addEventListener("load", function () {'
+                          f'document.documentElement.setCurrentTime(Math.max(0, (Date.now() - {start_ms}) / 1000));'
+                          '});</script>'))
+    
+    d.save_svg(filename)
+    print(f"Tide clock SVG for {start:%Y-%m-%d %H:%M} + {days} day(s) saved as '{filename}'")
 
-def main():
+def main(df=None):
     """Main function"""
     print("Creating enhanced SVG visualizations...")
     
     # Create flowing tides SVG
-    create_flowing_tides_svg()
+    create_flowing_tides_svg(df)
     
-    # Create tide clock SVG
-    create_tide_clock_svg()
+    # Create tide clock SVG, TIDE_CLOCK_DAYS=7 animates a whole week, TIDE_TZ is the zone of the data
+    create_tide_clock_svg(df, days=float(os.getenv('TIDE_CLOCK_DAYS', 1)),
+                          speed=float(os.getenv('TIDE_CLOCK_SPEED', 1)))
     
     print("All SVG visualizations created successfully!")
 
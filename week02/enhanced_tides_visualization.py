@@ -1,110 +1,146 @@
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-from matplotlib.patches import Circle
 import seaborn as sns
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import plotly.offline as pyo
+from animation_export import export_animation
+from downsample import downsample
+from tide_cube import CACHE_DIR, load_cube, source_name
+from tide_features import load_features
+from svg_paths import series_to_canvas, tide_path_d
+
+def wave_scene(tide_norm):
+    """Build the flowing wave figure, returns (fig, animate, init) for a blitted animation"""
+    # Set style
+    plt.style.use('dark_background')
+    
+    fig, ax = plt.subplots(figsize=(12, 8), facecolor='black')
+    ax.set_facecolor('black')
+    
+    # Create time series data
+    x_data = np.linspace(0, 2*np.pi, len(tide_norm))
+    
+    # Static decoration, drawn once
+    ax.set_xlim(0, 2*np.pi)
+    ax.set_ylim(-1.5, 1.5)
+    ax.set_title('Flowing Tides Visualization', 
+                color='white', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Time Phase', color='white')
+    ax.set_ylabel('Normalized Tide Level', color='white')
+    ax.grid(True, alpha=0.3)
+    
+    # Animated artists, updated in place every frame
+    main_wave, = ax.plot([], [], color='cyan', linewidth=2, alpha=0.8)
+    fill = ax.fill_between([], [], alpha=0.3, color='cyan')
+    secondary_wave, = ax.plot([], [], color='lightblue', linewidth=1, alpha=0.6)
+    particles = ax.scatter([], [], s=100, color='white', alpha=0.7)
+    artists = (fill, main_wave, secondary_wave, particles)
+    
+    def init():
+        main_wave.set_data([], [])
+        secondary_wave.set_data([], [])
+        fill.set_verts([])
+        particles.set_offsets(np.empty((0, 2)))
+        return artists
+    
+    def animate(frame):
+        # Calculate current frame waves
+        x = x_data[:frame+1]
+        wave1 = tide_norm[:frame+1] * np.sin(x + frame*0.1)
+        wave2 = tide_norm[:frame+1] * np.cos(x + frame*0.1)
+        
+        main_wave.set_data(x, wave1)
+        secondary_wave.set_data(x, wave2 * 0.5)
+        
+        # Area between the main wave and zero as a single polygon
+        fill.set_verts([np.column_stack([np.concatenate([x, x[::-1]]),
+                                         np.concatenate([wave1, np.zeros_like(wave1)])])])
+        
+        # Every 10th point becomes a particle in one batched collection
+        particles.set_offsets(np.column_stack([x[::10], wave1[::10]]))
+        
+        return artists
+    
+    return fig, animate, init
 
 class TidesVisualizer:
-    def __init__(self, csv_file='tides.csv'):
-        """Initialize tides visualizer"""
-        self.df = self.load_data(csv_file)
+    def __init__(self, csv_file='tides.csv', df=None, cache_dir=CACHE_DIR):
+        """Initialize tides visualizer, from csv_file or an already loaded DataFrame
+        
+        Derived features and the cube are cached in cache_dir under the name of csv_file,
+        cache_dir=None computes them without caching (e.g. for short-lived windows).
+        """
+        self.df = df.copy() if df is not None else self.load_data(csv_file)
+        self.cache_dir = cache_dir
+        self.source = source_name(csv_file)
         self.prepare_data()
         
     def load_data(self, csv_file):
-        """Load CSV data"""
+        """Load CSV data, or a partitioned parquet dataset directory"""
         try:
-            df = pd.read_csv(csv_file, names=['datetime', 'tide_level'], 
-                           parse_dates=['datetime'])
-            print(f"Successfully loaded {len(df)} records from {csv_file}")
+            # same loader as the SVG scripts, handles csv files with or without a header
+            from tides_store import load_source
+            df = load_source(csv_file)
+            kind = 'dataset ' if os.path.isdir(csv_file) else ''
+            print(f"Successfully loaded {len(df)} records from {kind}{csv_file}")
             return df
         except Exception as e:
             print(f"Error loading data: {e}")
             return None
             
     def prepare_data(self):
-        """Prepare data for visualization"""
+        """Prepare data for visualization
+        
+        Time parts, moving averages and the normalized level are computed once per
+        dataset and loaded from the feature cache afterwards.
+        """
         if self.df is None:
             return
             
-        # Add time-related columns
-        self.df['hour'] = self.df['datetime'].dt.hour
-        self.df['day'] = self.df['datetime'].dt.day
-        self.df['month'] = self.df['datetime'].dt.month
-        self.df['day_of_year'] = self.df['datetime'].dt.dayofyear
-        
-        # Calculate moving average
-        self.df['tide_smooth'] = self.df['tide_level'].rolling(window=5, center=True).mean()
-        
-        # Normalize tide height to 0-1 range
-        self.df['tide_norm'] = (self.df['tide_level'] - self.df['tide_level'].min()) / \
-                              (self.df['tide_level'].max() - self.df['tide_level'].min())
+        self.df = load_features(self.df, self.cache_dir, self.source)
     
-    def create_animated_wave(self, save_gif=True):
-        """Create animated wave effect"""
+    def create_animated_wave(self, save_gif=True, blit=True, filename='tides_animation.gif', workers=1):
+        """Create animated wave effect
+        
+        Artists are created once and only their data changes per frame, so frame cost
+        stays constant. With blit=True only the animated artists are redrawn on screen.
+        The export streams frames straight into the encoder picked from filename
+        (.gif, or .mp4/.webm through ffmpeg), rendered by workers processes.
+        """
         if self.df is None:
             return
             
-        fig, ax = plt.subplots(figsize=(12, 8), facecolor='black')
-        ax.set_facecolor('black')
-        
-        # Set style
-        plt.style.use('dark_background')
-        
-        # Create time series data
-        x_data = np.linspace(0, 2*np.pi, len(self.df))
-        
-        def animate(frame):
-            ax.clear()
-            ax.set_facecolor('black')
-            
-            # Calculate current frame waves
-            wave1 = self.df['tide_norm'].iloc[:frame+1] * np.sin(x_data[:frame+1] + frame*0.1)
-            wave2 = self.df['tide_norm'].iloc[:frame+1] * np.cos(x_data[:frame+1] + frame*0.1)
-            
-            if len(wave1) > 0:
-                # Draw main wave
-                ax.plot(x_data[:frame+1], wave1, color='cyan', linewidth=2, alpha=0.8)
-                ax.fill_between(x_data[:frame+1], wave1, alpha=0.3, color='cyan')
-                
-                # Draw secondary wave
-                ax.plot(x_data[:frame+1], wave2 * 0.5, color='lightblue', linewidth=1, alpha=0.6)
-                
-                # Add particle effects
-                for i in range(0, len(wave1), 10):
-                    if i < len(wave1):
-                        circle = Circle((x_data[i], wave1.iloc[i]), 0.05, 
-                                      color='white', alpha=0.7)
-                        ax.add_patch(circle)
-            
-            ax.set_xlim(0, 2*np.pi)
-            ax.set_ylim(-1.5, 1.5)
-            ax.set_title('Flowing Tides Visualization', 
-                        color='white', fontsize=16, fontweight='bold')
-            ax.set_xlabel('Time Phase', color='white')
-            ax.set_ylabel('Normalized Tide Level', color='white')
-            ax.grid(True, alpha=0.3)
-            
-        # Create animation
+        tide_norm = self.df['tide_norm'].to_numpy()
         frames = min(len(self.df), 200)  # Limit frames to control file size
-        anim = animation.FuncAnimation(fig, animate, frames=frames, 
-                                     interval=100, repeat=True)
         
         if save_gif:
-            print("Saving animation GIF...")
-            anim.save('tides_animation.gif', writer='pillow', fps=10)
-            print("Animation saved as tides_animation.gif")
+            print(f"Saving animation {filename}...")
+            export_animation(wave_scene, (tide_norm,), frames, filename, fps=10, workers=workers)
+            print(f"Animation saved as {filename}")
+        
+        # Create animation
+        fig, animate, init = wave_scene(tide_norm)
+        anim = animation.FuncAnimation(fig, animate, init_func=init, frames=frames, 
+                                     interval=100, repeat=True, blit=blit)
         
         plt.show()
         return anim
     
-    def create_interactive_plot(self):
-        """Create interactive Plotly chart"""
+    def create_interactive_plot(self, width=1600, method='lttb', webgl=None, interpolate=True):
+        """Create interactive Plotly chart
+        
+        The time series is downsampled to what the subplot can show (about two points per
+        pixel of a width wide dashboard, using 'lttb' or 'minmax'), and drawn with WebGL
+        (Scattergl) when webgl is True or, by default, when the raw series is larger than that.
+        The 3D surface shows the day of year x hour cube, interpolated between the high and
+        low readings unless interpolate is False.
+        """
         if self.df is None:
             return
             
@@ -116,26 +152,36 @@ class TidesVisualizer:
                    [{"secondary_y": False}, {"type": "surface"}]]
         )
         
+        # The time series takes half the dashboard width, keep ~2 points per pixel
+        max_points = width
+        if webgl is None:
+            webgl = len(self.df) > max_points
+        scatter = go.Scattergl if webgl else go.Scatter
+        
+        keep = downsample(self.df['datetime'], self.df['tide_level'], max_points, method)
+        sampled = self.df.iloc[keep]
+        
         # 1. Main tides time series
         fig.add_trace(
-            go.Scatter(x=self.df['datetime'], y=self.df['tide_level'],
-                      mode='lines', name='Tide Level',
-                      line=dict(color='cyan', width=2)),
+            scatter(x=sampled['datetime'], y=sampled['tide_level'],
+                    mode='lines', name='Tide Level',
+                    line=dict(color='cyan', width=2)),
             row=1, col=1
         )
         
         # Add moving average line
         fig.add_trace(
-            go.Scatter(x=self.df['datetime'], y=self.df['tide_smooth'],
-                      mode='lines', name='Smooth Trend',
-                      line=dict(color='orange', width=3, dash='dash')),
+            scatter(x=sampled['datetime'], y=sampled['tide_smooth'],
+                    mode='lines', name='Smooth Trend',
+                    line=dict(color='orange', width=3, dash='dash')),
             row=1, col=1
         )
         
-        # 2. Tide level distribution histogram
+        # 2. Tide level distribution histogram, binned here so the raw readings stay out of the html
+        counts, edges = np.histogram(self.df['tide_level'], bins=30)
         fig.add_trace(
-            go.Histogram(x=self.df['tide_level'], nbinsx=30,
-                        name='Distribution', marker_color='lightblue'),
+            go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                   name='Distribution', marker_color='lightblue'),
             row=1, col=2
         )
         
@@ -152,13 +198,13 @@ class TidesVisualizer:
             row=2, col=1
         )
         
-        # 4. 3D surface plot
-        X, Y = np.meshgrid(self.df['day_of_year'].unique()[:30], 
-                          self.df['hour'].unique())
-        Z = np.random.rand(len(self.df['hour'].unique()), 30)  # Simplified 3D data
+        # 4. 3D surface plot of the mean level per day of year and hour, cached per dataset
+        cube = load_cube(self.df, interpolate, self.cache_dir, self.source)
+        days = np.flatnonzero(~np.isnan(cube).all(axis=1))
         
         fig.add_trace(
-            go.Surface(z=Z, colorscale='viridis', name='3D Tides'),
+            go.Surface(z=cube[days], x=np.arange(24), y=days + 1,
+                       colorscale='viridis', name='3D Tides'),
             row=2, col=2
         )
         
@@ -206,50 +252,42 @@ class TidesVisualizer:
         plt.savefig('circular_tides.png', facecolor='black', dpi=300)
         plt.show()
     
-    def create_flowing_svg(self):
-        """Create SVG flowing effect"""
+    def create_flowing_svg(self, filename='flowing_tides.svg'):
+        """Create SVG flowing effect from the tide series"""
         import drawsvg as draw
         
+        if self.df is None:
+            return
+        
         # Create SVG canvas
         d = draw.Drawing(800, 400, origin='center')
         
         # Background
         d.append(draw.Rectangle(-400, -200, 800, 400, fill='#001122'))
         
-        # Generate wave path
-        wave_points = []
-        for i in range(80):
-            x = i * 10 - 400
-            y = 50 * np.sin(i * 0.2) * np.random.uniform(0.8, 1.2)
-            wave_points.extend([x, y])
+        times = self.df['datetime'].to_numpy()
         
-        # Main wave
-        d.append(draw.Lines(*wave_points, close=False,
+        # Main wave, the readings simplified to a fixed point budget
+        d.append(draw.Path(d=tide_path_d(times, self.df['tide_level'], 800, 100, -400, -50),
                            fill='none', stroke='cyan', stroke_width=3, opacity=0.8))
         
-        # Secondary wave
-        wave_points2 = []
-        for i in range(80):
-            x = i * 10 - 400
-            y = 30 * np.cos(i * 0.3) * np.random.uniform(0.7, 1.3)
-            wave_points2.extend([x, y])
-            
-        d.append(draw.Lines(*wave_points2, close=False,
+        # Secondary wave, the smoothed level
+        smooth = self.df['tide_smooth'].fillna(self.df['tide_level'])
+        d.append(draw.Path(d=tide_path_d(times, smooth, 800, 60, -400, -30),
                            fill='none', stroke='lightblue', stroke_width=2, opacity=0.6))
         
-        # Add particles
-        for _ in range(50):
-            x = np.random.uniform(-380, 380)
-            y = np.random.uniform(-180, 180)
-            radius = np.random.uniform(2, 8)
-            d.append(draw.Circle(x, y, radius, fill='white', opacity=0.4))
+        # Add particles on the 50 highest tides
+        x, y = series_to_canvas(times, self.df['tide_level'], 760, 360, -380, -180)
+        for i in np.argsort(self.df['tide_norm'].to_numpy())[-50:]:
+            radius = 2 + 6 * self.df['tide_norm'].iloc[i]
+            d.append(draw.Circle(round(x[i], 1), round(y[i], 1), round(radius, 1), fill='white', opacity=0.4))
         
         # Add text
         d.append(draw.Text('Flowing Tides Data Visualization', 20, 0, 150, fill='white', 
                           text_anchor='middle', font_family='Arial'))
         
-        d.save_svg('flowing_tides.svg')
-        print("SVG flowing effect saved as flowing_tides.svg")
+        d.save_svg(filename)
+        print(f"SVG flowing effect saved as {filename}")
         
     def generate_all_visualizations(self):
         """Generate all visualization effects"""
@@ -271,7 +309,8 @@ class TidesVisualizer:
 
 def main():
     """Main function"""
-    visualizer = TidesVisualizer()
+    # TIDES_SOURCE can point at tides.csv or a tides_store.py dataset directory
+    visualizer = TidesVisualizer(os.getenv('TIDES_SOURCE', 'tides.csv'))
     
     if visualizer.df is not None:
         visualizer.generate_all_visualizations()
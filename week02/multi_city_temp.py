@@ -1,18 +1,30 @@
+import asyncio
 import dotenv
 import os
-from scraping_utils import get_url, parse
+from scraping_utils import get_many
 dotenv.load_dotenv()
 
-url = os.getenv('MULTICITY_URL');
+url = os.getenv('MULTICITY_URL')
 
-for i in range(1, 10):
-    city_url = url.format(city_id=i)
-    print(city_url)
-    page = get_url(city_url, f'city-{i}.json')
-    tree = parse(page, 'json')    
-    city = tree['city']['cityName']
-    print(tree['city']['climate']['climateMonth'][0].keys())
+# how many cities to fetch and how hard to hit the server
+city_count = int(os.getenv('MULTICITY_COUNT', 9))
+rate = float(os.getenv('MULTICITY_RATE', 5))
+concurrency = int(os.getenv('MULTICITY_CONCURRENCY', 10))
 
-    
 
+async def main():
+    city_ids = range(1, city_count + 1)
+    urls = [url.format(city_id=i) for i in city_ids]
+    filenames = [f'city-{i}.json' for i in city_ids]
 
+    # results arrive as soon as each city is fetched, not in city_id order
+    async for city_url, tree in get_many(urls, filenames, 'json', rate=rate, concurrency=concurrency):
+        print(city_url)
+        if tree is None:
+            continue
+
+        city = tree['city']['cityName']
+        print(tree['city']['climate']['climateMonth'][0].keys())
+
+
+asyncio.run(main())
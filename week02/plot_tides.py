@@ -2,11 +2,14 @@ import requests
 from lxml import html
 import dotenv
 import os
-import datetime
+import hashlib
+import json
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-from scraping_utils import get_url, parse
+from scraping_utils import open_url, get_cache
+from tides_table import read_tide_table, empty_table, write_csv, format_csv
+from tide_features import load_features, trend_window
 
 class TidesDataCollector:
     """Tides data collector class"""
@@ -16,80 +19,128 @@ class TidesDataCollector:
         dotenv.load_dotenv()
         self.year = int(os.getenv('YEAR', 2024))
         self.filename = os.getenv('FILENAME', "crawled-page-{year}.html").format(year=self.year)
-        self.data = []
+        self.watermark_file = os.getenv('WATERMARK_FILE', 'tides.watermark.json')
+        self.data = empty_table()
         
     def collect_data(self):
         """Collect tides data"""
         try:
-            # Get page
-            page = get_url(os.getenv('URL'), self.filename)
+            # Stream the cached page and convert the whole table to columns at once
+            with open_url(os.getenv('URL'), self.filename) as page:
+                self.data = read_tide_table(page, self.year, os.getenv('ROW_XPATH'), os.getenv('COL_XPATH'))
+                
+        except Exception as e:
+            print(f"Error collecting data: {e}")
             
-            # Parse page to HTML
-            tree = parse(page, 'html')
+        print(f"Successfully collected {len(self.data)} tide records")
+        return self.data
+    
+    def load_watermark(self):
+        """Load the ingestion state saved next to the dataset, or None on the first run"""
+        if not os.path.exists(self.watermark_file):
+            return None
+        with open(self.watermark_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def save_watermark(self, state):
+        """Atomically save the ingestion state"""
+        tmp_file = self.watermark_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.watermark_file)
+    
+    def csv_tail_hash(self, filename, size, tail=64 * 1024):
+        """Hash of the last bytes of filename before size, identifies the content we wrote"""
+        with open(filename, 'rb') as f:
+            f.seek(max(size - tail, 0))
+            return hashlib.sha1(f.read(min(size, tail))).hexdigest()
+    
+    def csv_matches(self, filename, state):
+        """Check that filename still starts with the content the state describes
+        
+        Extra bytes after it can only be a partial append of an interrupted run.
+        """
+        return (os.path.exists(filename) and os.path.getsize(filename) >= state['csv_size']
+                and self.csv_tail_hash(filename, state['csv_size']) == state.get('csv_tail'))
+    
+    def ingest_incremental(self, filename='tides.csv'):
+        """Append only the readings newer than the stored watermark to filename"""
+        state = self.load_watermark()
+        if state is not None and state.get('csv') != filename:
+            state = None
+        
+        # A missing, shrunk or rewritten csv no longer matches the state, rebuild it from scratch
+        if state is not None and not self.csv_matches(filename, state):
+            print(f"{filename} does not match the stored watermark, rebuilding it")
+            state = None
+        
+        try:
+            # Fetch or revalidate the page, an unchanged page means there is nothing to do
+            entry = get_cache().fetch(os.getenv('URL'), self.filename)
+            page_state = {'path': entry['path'], 'size': entry['size'], 'mtime': os.path.getmtime(entry['path'])}
             
-            # Initialize row counter
-            row_num = 0
+            if state is not None and state['page'] == page_state:
+                print(f"Page unchanged since {state['watermark']}, nothing to ingest")
+                self.data = empty_table()
+                return self.data
+            
+            # Only convert rows from the watermark day of the same year onwards
+            since = None
+            if state is not None:
+                watermark = pd.Timestamp(state['watermark'])
+                since = (watermark.month, watermark.day) if watermark.year == self.year else None
+                if watermark.year > self.year:
+                    since = (13, 1)
+            
+            with get_cache().open_entry(entry) as page:
+                df = read_tide_table(page, self.year, os.getenv('ROW_XPATH'), os.getenv('COL_XPATH'), since)
             
-            # Iterate over table rows
-            for row in tree.xpath(os.getenv('ROW_XPATH')):
-                columns = row.xpath(os.getenv('COL_XPATH'))
-                columns = [column.text_content() for column in columns]
-                columns = [column.strip() for column in columns]
-                row_string = " ".join(columns).strip()
-                
-                # Skip empty rows
-                if row_string.strip() == "":
-                    continue
-                
-                row_num += 1
-                print(f'Processing Row {row_num}: {row_string}')
-                
-                if len(columns) >= 2:
-                    try:
-                        month = int(columns[0])
-                        day = int(columns[1])
-                        
-                        # Process time and value pairs
-                        for i in range(2, len(columns), 2):
-                            if i + 1 < len(columns) and columns[i] != "":
-                                # Get time in HHMM format
-                                time_str = columns[i]
-                                if len(time_str) >= 4:
-                                    hour = time_str[:2]
-                                    minute = time_str[2:]
-                                    
-                                    dt = datetime.datetime(self.year, month, day, int(hour), int(minute))
-                                    value = columns[i+1]
-                                    
-                                    if value and value.replace('.', '').replace('-', '').isdigit():
-                                        print(f'{dt} - {value}')
-                                        self.data.append((dt, float(value)))
-                    except (ValueError, IndexError) as e:
-                        print(f"Error processing row {row_num}: {e}")
-                        continue
-                        
         except Exception as e:
             print(f"Error collecting data: {e}")
+            return self.data
+        
+        if state is None and df.empty:
+            print("No data collected")
+            return self.data
+        
+        if state is None:
+            # First run, write everything
+            write_csv(df, filename)
+            self.data = df
+        else:
+            # Roll back a partial append left by an interrupted run, the content before it was checked above
+            if os.path.getsize(filename) > state['csv_size']:
+                os.truncate(filename, state['csv_size'])
             
-        print(f"Successfully collected {len(self.data)} tide records")
+            self.data = df[df['datetime'] > pd.Timestamp(state['watermark'])].reset_index(drop=True)
+            if not self.data.empty:
+                with open(filename, 'ab') as f:
+                    f.write(('\n'.join(format_csv(self.data)) + '\n').encode('utf-8'))
+        
+        # Remember how far we got, the page we read and the csv content that belongs to it
+        watermark = self.data['datetime'].max() if not self.data.empty else pd.Timestamp(state['watermark'])
+        csv_size = os.path.getsize(filename)
+        self.save_watermark({
+            'watermark': watermark.isoformat(),
+            'csv': filename,
+            'csv_size': csv_size,
+            'csv_tail': self.csv_tail_hash(filename, csv_size),
+            'page': page_state
+        })
+        
+        print(f"Ingested {len(self.data)} new tide records up to {watermark}")
         return self.data
     
     def save_to_csv(self, filename='tides.csv'):
-        """Save data to CSV file"""
-        if not self.data:
+        """Save data to CSV file, use a .gz filename for gzip output"""
+        if self.data.empty:
             print("No data to save")
             return
             
         try:
-            # Clear existing file
-            with open(filename, 'w') as f:
-                f.write('')  # Clear file
-                
-            # Write data
-            with open(filename, 'a', encoding='utf-8') as f:
-                for record in self.data:
-                    f.write(f'{record[0].strftime("%Y-%m-%d %H:%M")},{record[1]}\n')
-                    
+            # Format all records at once and atomically replace the file
+            write_csv(self.data, filename)
+            
             print(f"Data saved to {filename}")
             
         except Exception as e:
@@ -97,14 +148,14 @@ class TidesDataCollector:
     
     def create_basic_plot(self):
         """Create basic plot"""
-        if not self.data:
+        if self.data.empty:
             print("No data to plot")
             return
             
         try:
             # Prepare data
-            dates = [record[0] for record in self.data]
-            values = [record[1] for record in self.data]
+            dates = self.data['datetime'].to_numpy()
+            values = self.data['tide_level'].to_numpy()
             
             # Create plot
             plt.figure(figsize=(15, 8))
@@ -121,9 +172,8 @@ class TidesDataCollector:
             # Add moving average
             if len(values) > 10:
                 # Calculate moving average
-                window = min(50, len(values) // 10)
-                df = pd.DataFrame({'values': values})
-                moving_avg = df['values'].rolling(window=window, center=True).mean()
+                window = trend_window(len(values))
+                moving_avg = load_features(self.data, columns=['tide_trend'])['tide_trend'].to_numpy()
                 plt.plot(dates, moving_avg, 'r-', linewidth=2, alpha=0.8, label=f'{window}-point Moving Average')
                 plt.legend()
             
@@ -149,11 +199,17 @@ def main():
     # Create data collector
     collector = TidesDataCollector()
     
+    # Incremental mode for scheduled refreshes, only appends readings newer than the watermark
+    if os.getenv('INCREMENTAL', '0').lower() in ('1', 'true', 'yes'):
+        print("Ingesting new tide data...")
+        collector.ingest_incremental()
+        return
+    
     # Collect data
     print("Step 1: Collecting tide data...")
     data = collector.collect_data()
     
-    if data:
+    if not data.empty:
         # Save to CSV
         print("\nStep 2: Saving data to CSV...")
         collector.save_to_csv()
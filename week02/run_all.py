@@ -9,7 +9,32 @@ This script integrates all tides data collection, processing and visualization f
 import sys
 import os
 import subprocess
-import time
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Source files of the renderers, a stage reruns when any file it depends on changes
+VISUALIZER_DEPS = ['enhanced_tides_visualization.py', 'animation_export.py', 'downsample.py',
+                   'svg_paths.py', 'tide_cube.py', 'tide_features.py']
+DRAW_SVG_DEPS = ['draw_svg.py', 'svg_paths.py', 'tide_harmonics.py', 'tides_store.py', 'tides_table.py']
+
+# Pipeline stages: name -> (files the code depends on, files the stage writes)
+# The renderers only depend on the collected DataFrame, so they run in parallel
+RENDER_STAGES = {
+    'basic_plot': (['plot_tides.py', 'tides_table.py', 'tide_features.py', 'tide_cube.py'], ['tides_basic_plot.png']),
+    'animated_wave': (VISUALIZER_DEPS, ['tides_animation.gif']),
+    'dashboard': (VISUALIZER_DEPS, ['interactive_tides.html']),
+    'circular_plot': (VISUALIZER_DEPS, ['circular_tides.png']),
+    'flowing_svg': (VISUALIZER_DEPS, ['flowing_tides.svg']),
+    'svg_art': (DRAW_SVG_DEPS, ['flowing_tides_enhanced.svg']),
+    'tide_clock': (DRAW_SVG_DEPS, ['tide_clock.svg']),
+}
+
+# Stages that depend on the current time, they are rendered on every run
+UNCACHED_STAGES = {'tide_clock'}
+
+STATE_FILE = '.pipeline_state.json'
+
 
 def check_dependencies():
     """Check if dependencies are installed"""
@@ -48,47 +73,138 @@ def install_dependencies():
         print(f"Failed to install dependencies: {e}")
         return False
 
+def _use_agg_backend():
+    """Worker initializer, render off-screen so plt.show() never blocks"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_stage(name, df):
+    """Run a single render stage on the collected data, executed in a worker process"""
+    match name:
+        case 'basic_plot':
+            from plot_tides import TidesDataCollector
+            collector = TidesDataCollector()
+            collector.data = df
+            collector.create_basic_plot()
+        case 'svg_art':
+            import draw_svg
+            draw_svg.create_flowing_tides_svg(df)
+        case 'tide_clock':
+            import draw_svg
+            # the clock starts now, TIDE_CLOCK_DAYS=7 animates a whole week
+            draw_svg.create_tide_clock_svg(df, days=float(os.getenv('TIDE_CLOCK_DAYS', 1)),
+                                           speed=float(os.getenv('TIDE_CLOCK_SPEED', 1)))
+        case _:
+            from enhanced_tides_visualization import TidesVisualizer
+            visualizer = TidesVisualizer(df=df)
+            match name:
+                case 'animated_wave':
+                    visualizer.create_animated_wave()
+                case 'dashboard':
+                    visualizer.create_interactive_plot()
+                case 'circular_plot':
+                    visualizer.create_circular_tides()
+                case 'flowing_svg':
+                    visualizer.create_flowing_svg()
+    return name
+
+
+def data_fingerprint(df):
+    """Hash of the collected data, used to detect unchanged stage inputs"""
+    import pandas as pd
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+
+def code_hash(files):
+    """Hash of the source of files, changes whenever one of them is edited"""
+    digest = hashlib.sha1()
+    for path in files:
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha1(f.read()).digest())
+    return digest.hexdigest()
+
+
+def stage_key(name, data_hash):
+    """Everything a stage depends on: the data and the source of every file it uses"""
+    deps, _ = RENDER_STAGES[name]
+    return f'{data_hash}:{code_hash(deps)}'
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    """Atomically save the stage keys, an interrupted run never leaves a broken state file"""
+    tmp_file = STATE_FILE + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_file, STATE_FILE)
+
+
 def run_data_collection():
-    """Run data collection"""
+    """Run data collection, returns the tide DataFrame or None"""
     print("\n" + "="*50)
     print("Step 1: Collecting tide data")
     print("="*50)
     
     try:
-        exec(open('plot_tides.py').read())
+        from plot_tides import TidesDataCollector
+        collector = TidesDataCollector()
+        df = collector.collect_data()
+        if df.empty:
+            print("No data collected")
+            return None
+        
+        collector.save_to_csv()
         print("Data collection completed!")
-        return True
+        return df
     except Exception as e:
         print(f"Data collection failed: {e}")
-        return False
+        return None
 
-def run_enhanced_visualization():
-    """Run enhanced visualization"""
+def run_renderers(df, workers=None):
+    """Run the render stages whose inputs changed, in parallel processes"""
     print("\n" + "="*50)
-    print("Step 2: Creating enhanced visualizations")
+    print("Step 2: Creating visualizations and SVG animations")
     print("="*50)
     
-    try:
-        exec(open('enhanced_tides_visualization.py').read())
-        print("Enhanced visualization completed!")
-        return True
-    except Exception as e:
-        print(f"Enhanced visualization failed: {e}")
-        return False
-
-def run_svg_creation():
-    """Run SVG creation"""
-    print("\n" + "="*50)
-    print("Step 3: Creating SVG animations")
-    print("="*50)
+    state = load_state()
+    data_hash = data_fingerprint(df)
     
-    try:
-        exec(open('draw_svg.py').read())
-        print("SVG animation creation completed!")
+    # skip stages whose data and code are unchanged and whose outputs still exist
+    pending = {}
+    for name, (_, outputs) in RENDER_STAGES.items():
+        key = stage_key(name, data_hash)
+        if name not in UNCACHED_STAGES and state.get(name) == key and all(os.path.exists(output) for output in outputs):
+            print(f"- {name}: inputs unchanged, skipped")
+        else:
+            pending[name] = key
+    
+    if not pending:
         return True
-    except Exception as e:
-        print(f"SVG creation failed: {e}")
-        return False
+    
+    success = True
+    with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg_backend) as pool:
+        futures = {pool.submit(render_stage, name, df): name for name in pending}
+        
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                state[name] = pending[name]
+                print(f"- {name}: completed")
+            except Exception as e:
+                success = False
+                state.pop(name, None)
+                print(f"- {name}: failed: {e}")
+    
+    save_state(state)
+    return success
 
 def show_results():
     """Show generated files"""
@@ -152,18 +268,13 @@ def main():
             return
     
     print("\nStarting complete visualization pipeline...")
-    time.sleep(1)
     
-    # Step 1: Data collection
-    if run_data_collection():
-        time.sleep(2)
-        
-        # Step 2: Enhanced visualization
-        if run_enhanced_visualization():
-            time.sleep(2)
-            
-            # Step 3: SVG creation
-            run_svg_creation()
+    # Step 1: Data collection, the DataFrame is handed to the renderers in memory
+    df = run_data_collection()
+    
+    # Step 2: Independent renderers in parallel
+    if df is not None:
+        run_renderers(df)
     
     # Show results
     print("\n" + "="*60)
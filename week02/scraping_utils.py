@@ -1,35 +1,366 @@
 import requests
 import os
-from lxml import html
+from lxml import etree, html
 import json
+import asyncio
+import atexit
+import gzip
+import hashlib
+import random
+import threading
+import time
+import re
 
+# optional, only needed to stream json documents
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
-def get_url(url, filename):
-    if not os.path.exists(filename):
-        
-        # set useragent for requests
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-        
-        # fetch the page if it doesn't exist
-        page = requests.get(url, headers=headers)
+# set useragent for requests
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
 
-        # save the page to a file
-        with open(filename, 'w', encoding='UTF8') as f:
-            f.write(page.text)
 
-        page = page.text
+class HTTPCache:
+    """On-disk HTTP cache with a freshness policy, revalidation and LRU size eviction"""
+
+    def __init__(self, index_file='.http_cache.json', max_age=24 * 3600, max_size=200 * 1024 * 1024,
+                 compress=False, timeout=30):
+        self.index_file = index_file
+        self.max_age = max_age
+        self.max_size = max_size
+        self.compress = compress
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self._lock = threading.Lock()
+
+        # last_access of cache hits is only kept in memory and written with the next store or at exit
+        self._dirty = False
+        atexit.register(self.flush)
+
+        # filename -> {url, path, fetched_at, last_access, etag, last_modified, encoding, size, compressed}
+        self.index = {}
+        if os.path.exists(index_file):
+            with open(index_file, 'r', encoding='UTF8') as f:
+                self.index = json.load(f)
+
+    def _save_index(self):
+        # a temp file per process, so processes sharing the cache never rename each other's file
+        tmp_file = f'{self.index_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w', encoding='UTF8') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_file, self.index_file)
+        self._dirty = False
+
+    def flush(self):
+        """Save the access times of cache hits that are only held in memory"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def _lookup(self, url, filename):
+        """Return the cache entry for filename if it still holds url"""
+        entry = self.index.get(filename)
+
+        # adopt pages cached before the index existed
+        if entry is None and os.path.exists(filename):
+            entry = {'url': url, 'path': filename, 'fetched_at': os.path.getmtime(filename),
+                     'etag': None, 'last_modified': None, 'encoding': 'UTF8',
+                     'size': os.path.getsize(filename), 'compressed': False}
+
+        if entry is None or entry['url'] != url or not os.path.exists(entry['path']):
+            return None
+        return entry
+
+    def _is_fresh(self, entry, max_age):
+        max_age = self.max_age if max_age is None else max_age
+        return time.time() - entry['fetched_at'] < max_age
+
+    def is_fresh(self, url, filename, max_age=None):
+        """Check whether url can be served from filename without touching the network"""
+        with self._lock:
+            entry = self._lookup(url, filename)
+        return entry is not None and self._is_fresh(entry, max_age)
+
+    def _store(self, url, filename, response, old_entry):
+        """Write the raw response bytes (optionally gzipped) and return the new entry"""
+        path = filename + '.gz' if self.compress else filename
+        tmp_path = path + '.tmp'
+
+        if self.compress:
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(response.content)
+        else:
+            with open(tmp_path, 'wb') as f:
+                f.write(response.content)
+        os.replace(tmp_path, path)
+
+        # drop the previous file if it was stored in the other format
+        if old_entry is not None and old_entry['path'] != path and os.path.exists(old_entry['path']):
+            os.remove(old_entry['path'])
+
+        # only trust the declared charset, otherwise fall back to UTF8
+        content_type = response.headers.get('Content-Type', '')
+        encoding = response.encoding if 'charset' in content_type.lower() else 'UTF8'
+
+        return {'url': url, 'path': path, 'fetched_at': time.time(),
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'encoding': encoding, 'size': os.path.getsize(path), 'compressed': self.compress}
+
+    def _evict(self, keep):
+        """Remove least recently used entries until the cache fits in max_size"""
+        total = sum(entry['size'] for entry in self.index.values())
+        for filename, entry in sorted(self.index.items(), key=lambda item: item[1].get('last_access', 0)):
+            if total <= self.max_size:
+                break
+            if filename == keep:
+                continue
+            if os.path.exists(entry['path']):
+                os.remove(entry['path'])
+            total -= entry['size']
+            del self.index[filename]
+
+    def fetch(self, url, filename, max_age=None):
+        """Make sure filename holds a fresh copy of url and return its cache entry"""
+        with self._lock:
+            entry = self._lookup(url, filename)
+
+        if entry is not None and self._is_fresh(entry, max_age):
+            with self._lock:
+                entry['last_access'] = time.time()
+                self.index[filename] = entry
+                self._dirty = True
+            return entry
+
+        # revalidate what we already have
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except requests.RequestException as e:
+            # serve the stale copy rather than failing when offline
+            if entry is None:
+                raise
+            print(f"Could not revalidate {url}, using stale copy: {e}")
+            return entry
+
+        with self._lock:
+            if response.status_code == 304:
+                entry['fetched_at'] = time.time()
+            else:
+                entry = self._store(url, filename, response, entry)
+
+            entry['last_access'] = time.time()
+            self.index[filename] = entry
+            self._evict(keep=filename)
+            self._save_index()
+
+        return entry
+
+    def open_entry(self, entry):
+        """Open the raw bytes of a cache entry as a binary file"""
+        if entry['compressed']:
+            return gzip.open(entry['path'], 'rb')
+        return open(entry['path'], 'rb')
+
+    def fetch_and_open(self, url, filename, max_age=None):
+        """Fetch url if needed and open its cached bytes, returns (entry, binary file)
+
+        Another thread may evict the file between fetching and opening it, then it is
+        fetched again.
+        """
+        for attempt in range(2):
+            entry = self.fetch(url, filename, max_age)
+            try:
+                return entry, self.open_entry(entry)
+            except FileNotFoundError:
+                if attempt:
+                    raise
+
+
+_cache = None
+
+
+def get_cache():
+    """Return the shared cache, configured from CACHE_MAX_AGE, CACHE_MAX_SIZE_MB and CACHE_COMPRESS"""
+    global _cache
+    if _cache is None:
+        _cache = HTTPCache(max_age=float(os.getenv('CACHE_MAX_AGE', 24 * 3600)),
+                           max_size=float(os.getenv('CACHE_MAX_SIZE_MB', 200)) * 1024 * 1024,
+                           compress=os.getenv('CACHE_COMPRESS', '0').lower() in ('1', 'true', 'yes'))
+    return _cache
+
+
+def get_url(url, filename, max_age=None):
+    cache = get_cache()
+
+    # fetch the page if it is missing or stale, otherwise read it from the file
+    entry, f = cache.fetch_and_open(url, filename, max_age)
+    with f:
+        page = f.read().decode(entry['encoding'], errors='replace')
 
-    else:
-        # if the page exists, read it from the file
-        with open(filename, 'r', encoding='UTF8') as f:
-            page = f.read() 
-            
     return page
 
+
+def open_url(url, filename, max_age=None):
+    """Like get_url but returns the cached page as a binary file, for streaming parsers"""
+    _, f = get_cache().fetch_and_open(url, filename, max_age)
+    return f
+
+class TokenBucket:
+    """Async token bucket allowing rate requests per second with bursts up to capacity"""
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        if capacity is not None and capacity < 1:
+            raise ValueError(f"capacity must be at least 1 token, got {capacity}")
+
+        # a bucket smaller than one token could never hand one out
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                # refill according to the time passed since the last request
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def get_many(urls, filenames=None, mode='json', rate=5, concurrency=10, retries=3, backoff=0.5, max_age=None):
+    """Fetch and parse many urls concurrently, yields (url, tree) in the order they arrive
+
+    Network requests are limited to rate per second, cached pages are served immediately.
+    Failed requests are retried with exponential backoff, a url that keeps failing yields None.
+    """
+    urls = list(urls)
+    if filenames is None:
+        filenames = [f"cache-{hashlib.sha1(url.encode()).hexdigest()[:16]}.{mode}" for url in urls]
+
+    cache = get_cache()
+    bucket = TokenBucket(rate)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(url, filename):
+        async with slots:
+            for attempt in range(retries + 1):
+                if not cache.is_fresh(url, filename, max_age):
+                    await bucket.acquire()
+
+                try:
+                    # requests is blocking, run it on the default thread pool
+                    page = await asyncio.to_thread(get_url, url, filename, max_age)
+                    return url, parse(page, mode)
+
+                except (requests.RequestException, ValueError) as e:
+                    # client errors other than throttling will not go away by retrying
+                    response = getattr(e, 'response', None)
+                    permanent = response is not None and response.status_code < 500 and response.status_code != 429
+
+                    if attempt == retries or permanent:
+                        print(f"Giving up on {url}: {e}")
+                        return url, None
+
+                    delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                    print(f"Retrying {url} in {delay:.1f}s: {e}")
+                    await asyncio.sleep(delay)
+
+    tasks = [asyncio.create_task(fetch_one(url, filename)) for url, filename in zip(urls, filenames)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
 def parse(page, mode = 'html'):
     match mode:
         case 'html':
             return html.fromstring(page)
         case 'json':
-            return json.loads(page)
\ No newline at end of file
+            return json.loads(page)
+
+
+def _path_matcher(row_xpath):
+    """Compile a simple location path such as //html/body/table/tbody/tr to a regex over element paths"""
+    steps = re.findall(r'(//?)([^/]*)', row_xpath)
+    if not steps or ''.join(sep + name for sep, name in steps) != row_xpath:
+        raise ValueError(f"Cannot stream xpath {row_xpath!r}")
+
+    pattern = ''
+    for sep, name in steps:
+        if not re.fullmatch(r'[\w.-]+|\*', name):
+            raise ValueError(f"Streaming only supports plain element steps, got {name!r} in {row_xpath!r}")
+
+        tag = '[^/]+' if name == '*' else re.escape(name.lower())
+        pattern += ('(?:/[^/]+)*/' if sep == '//' else '/') + tag
+
+    return re.compile(pattern + '$'), steps[-1][1].lower()
+
+
+def iterparse(source, row_xpath, mode='html', chunk_size=64 * 1024, encoding=None):
+    """Incrementally parse source (a binary file or path) and yield rows matching row_xpath
+
+    In html mode row_xpath is a simple location path (e.g. ROW_XPATH) and each yielded row is an
+    lxml.html element. Rows are cleared once the caller moves on, so do not keep references to them.
+    In json mode row_xpath is an ijson prefix such as 'city.climate.climateMonth.item'.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield from iterparse(f, row_xpath, mode, chunk_size, encoding)
+        return
+
+    match mode:
+        case 'html':
+            matcher, tag = _path_matcher(row_xpath)
+
+            parser = etree.HTMLPullParser(events=('end',), tag=None if tag == '*' else tag, encoding=encoding)
+            parser.set_element_class_lookup(html.HtmlElementClassLookup())
+
+            def rows():
+                for _, row in parser.read_events():
+                    path = ''.join('/' + el.tag for el in reversed(list(row.iterancestors())))
+                    if not matcher.match(f'{path}/{row.tag}'):
+                        continue
+
+                    yield row
+
+                    # free the row and everything parsed before it
+                    row.clear()
+                    while row.getprevious() is not None:
+                        del row.getparent()[0]
+
+            while chunk := source.read(chunk_size):
+                parser.feed(chunk)
+                yield from rows()
+
+            # closing the parser ends the elements still open at the end of the input
+            parser.close()
+            yield from rows()
+
+        case 'json':
+            if ijson is None:
+                raise ImportError("Streaming json needs ijson, run: pip install ijson")
+            yield from ijson.items(source, row_xpath)
@@ -0,0 +1,190 @@
+import argparse
+import hashlib
+import html
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
+import pandas as pd
+
+from run_all import _use_agg_backend, code_hash
+from tides_store import load_source
+
+# optional, only needed to rasterize the gallery to PNG
+try:
+    import cairosvg
+except ImportError:
+    cairosvg = None
+
+GALLERY_DIR = 'svg_gallery'
+
+# the drawing code, cached renders are not reused once one of these files changes
+RENDER_DEPS = [os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+               for name in ('draw_svg.py', 'svg_paths.py', 'tide_harmonics.py',
+                            'enhanced_tides_visualization.py', 'tide_features.py', 'tides_store.py')]
+
+KINDS = ('flowing', 'clock', 'wave')
+
+
+def source_fingerprint(source):
+    """Size and mtime of a csv file or of every file of a dataset directory"""
+    if not os.path.isdir(source):
+        stat = os.stat(source)
+        return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+    parts = []
+    for root, _, files in sorted(os.walk(source)):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            parts.append(f'{name}:{stat.st_size}:{stat.st_mtime_ns}')
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def variant_key(params):
+    """Cache key of a variant: every parameter, the state of its source data and the drawing code"""
+    data = dict(params, fingerprint=source_fingerprint(params['source']), code=code_hash(RENDER_DEPS))
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def variants(sources, starts, styles, kinds, days=1):
+    """Every combination of source (station), start day, style and kind"""
+    return [{'kind': kind, 'source': source, 'start': str(pd.Timestamp(start)), 'days': days, 'style': style}
+            for source, start, style, kind in itertools.product(sources, starts, styles, kinds)]
+
+
+@lru_cache(maxsize=8)
+def _load(source, fingerprint):
+    """Load a source once per worker process (and again only when it changes)"""
+    return load_source(source)
+
+
+def rasterize(svg_path, png_path, scale=1):
+    """Render an SVG file to PNG with cairosvg"""
+    if cairosvg is None:
+        raise ImportError("Rasterizing needs cairosvg, run: pip install cairosvg")
+    cairosvg.svg2png(url=svg_path, write_to=png_path, scale=scale)
+
+
+def render_variant(params, out_dir=GALLERY_DIR, png=False, scale=1):
+    """Render one variant in a worker process, returns (params, files, status)
+
+    Files are named after the variant key, so a variant that was rendered before
+    with the same parameters and data is not drawn again.
+    """
+    base = os.path.join(out_dir, f"{params['kind']}-{variant_key(params)}")
+    files = [base + '.svg'] + ([base + '.png'] if png else [])
+    if all(os.path.exists(path) for path in files):
+        return params, files, 'cached'
+
+    import draw_svg
+
+    df = _load(params['source'], source_fingerprint(params['source']))
+    start = pd.Timestamp(params['start'])
+    end = start + pd.Timedelta(days=params['days'])
+    window = df[(df['datetime'] >= start) & (df['datetime'] < end)]
+    station = os.path.splitext(os.path.basename(params['source'].rstrip('/')))[0]
+
+    # draw next to the final file and rename, so an interrupted run never leaves a cached half file
+    tmp_svg = f'{base}.{os.getpid()}.tmp.svg'
+    match params['kind']:
+        case 'flowing':
+            if len(window) < 2:
+                return params, [], 'empty'
+            draw_svg.create_flowing_tides_svg(window, style=params['style'], filename=tmp_svg,
+                                              subtitle=f'{station} from {start:%Y-%m-%d}')
+        case 'clock':
+            draw_svg.create_tide_clock_svg(df, start, params['days'], style=params['style'], filename=tmp_svg)
+        case 'wave':
+            if len(window) < 2:
+                return params, [], 'empty'
+            from enhanced_tides_visualization import TidesVisualizer
+            TidesVisualizer(df=window, cache_dir=None).create_flowing_svg(tmp_svg)
+        case kind:
+            raise ValueError(f"Unknown variant kind {kind!r}")
+
+    tmp_png = f'{base}.{os.getpid()}.tmp.png'
+    try:
+        if png:
+            rasterize(tmp_svg, tmp_png, scale)
+            os.replace(tmp_png, base + '.png')
+        os.replace(tmp_svg, base + '.svg')
+    finally:
+        for path in (tmp_svg, tmp_png):
+            if os.path.exists(path):
+                os.remove(path)
+
+    return params, files, 'rendered'
+
+
+def write_index(results, out_dir=GALLERY_DIR):
+    """Write an index.html showing every rendered variant with its parameters"""
+    items = []
+    for params, files, _ in sorted(results, key=lambda result: json.dumps(result[0], sort_keys=True)):
+        if not files:
+            continue
+        image = os.path.basename(files[-1])
+        caption = html.escape(f"{params['kind']} {os.path.basename(params['source'])} "
+                              f"{params['start'][:10]} +{params['days']}d {params['style']}")
+        items.append(f'<figure><img src="{image}" width="320"><figcaption>{caption}</figcaption></figure>')
+
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Tide gallery</title>'
+                '<style>body{background:#111;color:#ccc;font-family:Arial}figure{display:inline-block}</style>'
+                '</head><body>\n' + '\n'.join(items) + '\n</body></html>\n')
+
+
+def render_batch(params_list, out_dir=GALLERY_DIR, png=False, scale=1, workers=None):
+    """Render all variants in parallel worker processes and write the gallery index"""
+    if png and cairosvg is None:
+        raise ImportError("Rasterizing needs cairosvg, run: pip install cairosvg")
+    os.makedirs(out_dir, exist_ok=True)
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg_backend) as pool:
+        futures = [pool.submit(render_variant, params, out_dir, png, scale) for params in params_list]
+
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Error rendering variant: {e}")
+
+    write_index(results, out_dir)
+
+    counts = pd.Series([status for _, _, status in results]).value_counts().to_dict()
+    print(f"Gallery {out_dir}: {counts}")
+    return results
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Render a gallery of tide SVG variants in parallel')
+    parser.add_argument('sources', nargs='*', default=['tides.csv'], help='one tides.csv or dataset per station')
+    parser.add_argument('--start', help='first day (default: first day of the data)')
+    parser.add_argument('--end', help='last day (default: a week after start)')
+    parser.add_argument('--every', default='1D', help='step between variants, e.g. 1D or 7D')
+    parser.add_argument('--days', type=float, default=1, help='days covered by each variant')
+    parser.add_argument('--styles', nargs='+', default=['ocean'], help='styles from draw_svg.STYLES')
+    parser.add_argument('--kinds', nargs='+', default=list(KINDS), choices=KINDS)
+    parser.add_argument('--png', action='store_true', help='also rasterize every variant to PNG')
+    parser.add_argument('--scale', type=float, default=1, help='PNG scale factor')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--out', default=GALLERY_DIR, help='gallery directory')
+    args = parser.parse_args()
+
+    start = args.start
+    if start is None:
+        start = load_source(args.sources[0])['datetime'].min().normalize()
+    end = args.end or pd.Timestamp(start) + pd.Timedelta(days=6)
+
+    starts = pd.date_range(start, end, freq=args.every)
+    params_list = variants(args.sources, starts, args.styles, args.kinds, args.days)
+    print(f"Rendering {len(params_list)} variants...")
+
+    render_batch(params_list, args.out, args.png, args.scale, args.workers)
+
+
+if __name__ == "__main__":
+    main()
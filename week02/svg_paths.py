@@ -0,0 +1,92 @@
+import heapq
+
+import numpy as np
+
+
+def _farthest(x, y, start, end):
+    """Inner point farthest from the chord start-end, returns (distance, index)"""
+    dx, dy = x[end] - x[start], y[end] - y[start]
+    px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+    length = np.hypot(dx, dy)
+    if length == 0:
+        distance = np.hypot(px, py)
+    else:
+        distance = np.abs(dx * py - dy * px) / length
+
+    i = int(np.argmax(distance))
+    return distance[i], start + 1 + i
+
+
+def simplify(x, y, max_points, epsilon=0):
+    """Indices of at most max_points points that keep the shape of the polyline
+
+    Ramer-Douglas-Peucker run best first: the segment whose farthest point deviates most
+    is split next, until the budget is spent or no point deviates more than epsilon.
+    Only max_points splits are ever computed, so long series stay cheap.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= 2 or (n <= max_points and not epsilon):
+        return np.arange(n)
+
+    keep = [0, n - 1]
+    distance, split = _farthest(x, y, 0, n - 1)
+    heap = [(-distance, split, 0, n - 1)]
+
+    while heap and len(keep) < max_points:
+        distance, split, start, end = heapq.heappop(heap)
+        if -distance <= epsilon:
+            break
+        keep.append(split)
+
+        for a, b in ((start, split), (split, end)):
+            if b - a >= 2:
+                distance, index = _farthest(x, y, a, b)
+                heapq.heappush(heap, (-distance, index, a, b))
+
+    return np.sort(keep)
+
+
+def path_d(x, y, precision=1, close=False):
+    """Compact SVG path data: an absolute move followed by relative line segments
+
+    Coordinates are snapped to the precision grid before taking differences,
+    so rounding errors do not add up along the path.
+    """
+    scale = 10 ** precision
+    qx = np.round(np.asarray(x) * scale).astype(np.int64)
+    qy = np.round(np.asarray(y) * scale).astype(np.int64)
+
+    steps = np.column_stack([np.diff(qx), np.diff(qy)]).ravel()
+    numbers = np.concatenate([[qx[0], qy[0]], steps]) / scale
+    tokens = [f'{value:.{precision}f}'.rstrip('0').rstrip('.') or '0' for value in numbers]
+    tokens = ['0' if token == '-0' else token for token in tokens]
+
+    d = f'M{tokens[0]} {tokens[1]}'
+    if len(tokens) > 2:
+        d += 'l' + ' '.join(tokens[2:])
+    if close:
+        d += 'z'
+
+    # a minus sign already separates two numbers
+    return d.replace(' -', '-')
+
+
+def series_to_canvas(times, levels, width, height, x0=0, y0=0):
+    """Map a time series onto a width x height box at (x0, y0), higher levels are drawn higher up"""
+    t = np.asarray(times).astype('datetime64[s]').astype(np.float64)
+    v = np.asarray(levels, dtype=np.float64)
+
+    t_span = np.ptp(t) or 1
+    v_span = np.ptp(v) or 1
+    x = x0 + (t - t.min()) / t_span * width
+    y = y0 + height - (v - v.min()) / v_span * height
+    return x, y
+
+
+def tide_path_d(times, levels, width, height, x0=0, y0=0, max_points=400, precision=1):
+    """Path data of a tide series fitted into a box and simplified to max_points"""
+    x, y = series_to_canvas(times, levels, width, height, x0, y0)
+    keep = simplify(x, y, max_points)
+    return path_d(x[keep], y[keep], precision)
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = '.tide_cache'
+
+# bump when the cube layout or the interpolation changes, old cache files are then ignored
+CUBE_VERSION = 1
+
+
+def dataset_hash(df):
+    """Hash of the datetime and tide_level columns, identifies a tide dataset"""
+    data = df[['datetime', 'tide_level']]
+    return hashlib.sha1(pd.util.hash_pandas_object(data, index=False).values.tobytes()).hexdigest()
+
+
+def source_name(source):
+    """Short name of a tides.csv file or dataset directory, cache files are grouped by it"""
+    return os.path.splitext(os.path.basename(os.path.abspath(source)))[0]
+
+
+def cache_path(cache_dir, prefix, source, df, suffix):
+    """Path of the cache file of df, e.g. .tide_cache/features-tides-<hash>-v1.feather"""
+    return os.path.join(cache_dir, f'{prefix}-{source}-{dataset_hash(df)}{suffix}')
+
+
+def evict_stale(path, prefix, source, suffix_pattern):
+    """Remove the other cache files of the same kind and source, so every refresh replaces its file"""
+    cache_dir, keep = os.path.split(path)
+    pattern = re.compile(re.escape(f'{prefix}-{source}-') + r'[0-9a-f]{40}' + suffix_pattern)
+    for name in os.listdir(cache_dir):
+        if name != keep and pattern.fullmatch(name):
+            # another process may have removed it already
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+def hourly_levels(df):
+    """Interpolate the high/low readings to every whole hour between the first and last one
+
+    Between two turning points the water follows half a cosine, which matches the
+    tide much better than a straight line. Returns (hours as datetime64[h], levels).
+    """
+    times = df['datetime'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    levels = df['tide_level'].to_numpy().astype(np.float64)
+
+    order = np.argsort(times, kind='stable')
+    times, levels = times[order], levels[order]
+
+    hours = np.arange(-(-times[0] // 3600), times[-1] // 3600 + 1, dtype=np.int64)
+    seconds = hours * 3600
+
+    # segment between the readings before and after every hour
+    right = np.clip(np.searchsorted(times, seconds, side='right'), 1, len(times) - 1)
+    left = right - 1
+    span = np.maximum(times[right] - times[left], 1)
+    frac = np.clip((seconds - times[left]) / span, 0, 1)
+
+    weight = (1 - np.cos(np.pi * frac)) / 2
+    return hours.astype('datetime64[h]'), levels[left] + (levels[right] - levels[left]) * weight
+
+
+def build_cube(df, interpolate=True):
+    """Mean tide level per day of year (rows, 366) and hour of day (columns, 24)
+
+    All readings (or, with interpolate, the hourly curve between them) are binned
+    in one bincount, cells without any reading are NaN.
+    """
+    if interpolate and len(df) > 1:
+        stamps, levels = hourly_levels(df)
+    else:
+        stamps = df['datetime'].to_numpy().astype('datetime64[s]')
+        levels = df['tide_level'].to_numpy().astype(np.float64)
+
+    day_of_year = (stamps.astype('datetime64[D]') - stamps.astype('datetime64[Y]')).astype(np.int64)
+    hour = (stamps.astype('datetime64[h]') - stamps.astype('datetime64[D]')).astype(np.int64)
+    cell = day_of_year * 24 + hour
+
+    sums = np.bincount(cell, weights=levels, minlength=366 * 24)
+    counts = np.bincount(cell, minlength=366 * 24)
+
+    with np.errstate(invalid='ignore'):
+        cube = sums / counts
+    return cube.reshape(366, 24)
+
+
+def load_cube(df, interpolate=True, cache_dir=CACHE_DIR, source='tides'):
+    """Return the cube of df, computed once per dataset and kept in cache_dir as .npy
+
+    Only the newest cube of a source is kept, cache_dir=None skips the cache.
+    """
+    if cache_dir is None:
+        return build_cube(df, interpolate)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, 'cube', source, df, f'-{int(interpolate)}-v{CUBE_VERSION}.npy')
+
+    if os.path.exists(path):
+        return np.load(path)
+
+    cube = build_cube(df, interpolate)
+
+    # write aside and rename so a concurrent reader never sees half a file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, cube)
+    os.replace(tmp_path, path)
+
+    evict_stale(path, 'cube', source, rf'-{int(interpolate)}-v\d+\.npy')
+    return cube
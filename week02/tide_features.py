@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from tide_cube import CACHE_DIR, cache_path, evict_stale
+
+# bump when a derived column changes, old feature files are then ignored
+FEATURE_VERSION = 1
+
+
+def trend_window(n):
+    """Window of the long moving average, about a tenth of the series and at most 50 readings"""
+    return min(50, n // 10)
+
+
+def compute_features(df):
+    """Add the time parts, smoothed, trend and normalized tide level columns to a copy of df"""
+    df = df[['datetime', 'tide_level']].reset_index(drop=True)
+    stamps = df['datetime'].dt
+
+    df['hour'] = stamps.hour.astype(np.int8)
+    df['day'] = stamps.day.astype(np.int8)
+    df['month'] = stamps.month.astype(np.int8)
+    df['day_of_year'] = stamps.dayofyear.astype(np.int16)
+
+    levels = df['tide_level']
+    df['tide_smooth'] = levels.rolling(window=5, center=True).mean()
+
+    # long moving average used by the basic plot, only meaningful for more than 10 readings
+    window = trend_window(len(df))
+    df['tide_trend'] = levels.rolling(window=window, center=True).mean() if len(df) > 10 else np.nan
+
+    low, high = levels.min(), levels.max()
+    df['tide_norm'] = (levels - low) / (high - low)
+
+    return df
+
+
+def load_features(df, cache_dir=CACHE_DIR, source='tides', columns=None):
+    """Return df with its derived columns, computed once per dataset and kept in cache_dir
+
+    Features are stored as uncompressed Feather and memory-mapped on the next run, so
+    asking only for some columns reads only their pages. Only the newest feature file
+    of a source is kept, cache_dir=None skips the cache.
+    """
+    if cache_dir is None:
+        features = compute_features(df)
+        return features if columns is None else features[columns]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(cache_dir, 'features', source, df, f'-v{FEATURE_VERSION}.feather')
+
+    if os.path.exists(path):
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+    features = compute_features(df)
+
+    # write aside and rename so a concurrent reader never sees half a file
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(pa.Table.from_pandas(features, preserve_index=False), tmp_path,
+                          compression='uncompressed')
+    os.replace(tmp_path, path)
+
+    evict_stale(path, 'features', source, r'-v\d+\.feather')
+    return features if columns is None else features[columns]
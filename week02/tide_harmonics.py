@@ -0,0 +1,206 @@
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+# angular speed of the standard constituents in degrees per hour
+CONSTITUENTS = {
+    'M2': 28.9841042, 'S2': 30.0000000, 'N2': 28.4397295, 'K2': 30.0821373,
+    'K1': 15.0410686, 'O1': 13.9430356, 'P1': 14.9589314, 'Q1': 13.3986609,
+    'M4': 57.9682084, 'MS4': 58.9841042, 'M6': 86.9523127,
+    'Mf': 1.0980331, 'Mm': 0.5443747, 'Ssa': 0.0821373, 'Sa': 0.0410686,
+}
+
+
+def _hours(times, epoch):
+    """Hours since epoch as float64, times can be anything pandas understands"""
+    times = pd.to_datetime(np.asarray(times)).to_numpy().astype('datetime64[s]')
+    return (times - np.datetime64(epoch, 's')).astype(np.float64) / 3600
+
+
+def resolvable(names, duration):
+    """Keep the constituents that can be told apart from the others in a record of duration hours
+
+    Rayleigh criterion: two speeds are separable when they differ by at least one cycle
+    over the record. Constituents are kept in the given order, the first of a pair wins.
+    """
+    kept = []
+    for name in names:
+        speed = CONSTITUENTS[name]
+        if speed * duration < 360:
+            continue
+        if all(abs(speed - CONSTITUENTS[other]) * duration >= 360 for other in kept):
+            kept.append(name)
+    return kept
+
+
+class TideModel:
+    """Mean level plus a sum of cosines, one per constituent: h(t) = mean + sum A cos(w t - phase)"""
+
+    def __init__(self, epoch, mean, names, amplitudes, phases):
+        self.epoch = np.datetime64(epoch, 's')
+        self.mean = float(mean)
+        self.names = list(names)
+        self.amplitudes = np.asarray(amplitudes, dtype=np.float64)
+        self.phases = np.asarray(phases, dtype=np.float64)
+        self.speeds = np.radians([CONSTITUENTS[name] for name in self.names])
+
+    def predict(self, times, chunk_size=1_000_000):
+        """Predicted tide level at times (datetime-like array), evaluated in chunks to bound memory"""
+        hours = _hours(times, self.epoch)
+        levels = np.empty(len(hours))
+
+        for start in range(0, len(hours), chunk_size):
+            angles = np.outer(hours[start:start + chunk_size], self.speeds) - self.phases
+            levels[start:start + chunk_size] = self.mean + np.cos(angles) @ self.amplitudes
+
+        return levels
+
+    def predict_range(self, start, end, freq='1min'):
+        """Predicted tide table between start and end (inclusive) at freq resolution"""
+        times = pd.date_range(start, end, freq=freq)
+        return pd.DataFrame({'datetime': times, 'tide_level': self.predict(times).astype(np.float32)})
+
+    def constituents(self):
+        """Fitted amplitude (m) and phase (degrees) per constituent"""
+        return pd.DataFrame({'speed': np.degrees(self.speeds), 'amplitude': self.amplitudes,
+                             'phase': np.degrees(self.phases) % 360}, index=self.names)
+
+    def to_dict(self):
+        return {'epoch': str(self.epoch), 'mean': self.mean, 'names': self.names,
+                'amplitudes': self.amplitudes.tolist(), 'phases': self.phases.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['epoch'], data['mean'], data['names'], data['amplitudes'], data['phases'])
+
+    def save(self, filename):
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def fit_harmonics(df, names=None):
+    """Fit the constituents (default: all that the record can resolve) to the readings by least squares
+
+    Every constituent contributes a cosine and a sine column to one design matrix, so the
+    whole fit is a single lstsq call. Nodal corrections are not applied, which is fine for
+    records of a year or two.
+    """
+    df = df.dropna(subset=['tide_level'])
+    if len(df) < 3:
+        raise ValueError("Need at least 3 readings to fit a tide model")
+
+    epoch = df['datetime'].min()
+    hours = _hours(df['datetime'], epoch)
+    levels = df['tide_level'].to_numpy().astype(np.float64)
+
+    names = resolvable(names or CONSTITUENTS, hours.max() - hours.min())
+
+    # never fit more unknowns than there are readings
+    names = names[:(len(df) - 1) // 2]
+
+    speeds = np.radians([CONSTITUENTS[name] for name in names])
+    angles = np.outer(hours, speeds)
+    design = np.column_stack([np.ones_like(hours), np.cos(angles), np.sin(angles)])
+
+    coef, *_ = np.linalg.lstsq(design, levels, rcond=None)
+    a, b = coef[1:1 + len(names)], coef[1 + len(names):]
+
+    # a cos(wt) + b sin(wt) = A cos(wt - phase)
+    return TideModel(epoch, coef[0], names, np.hypot(a, b), np.arctan2(b, a))
+
+
+def extremes(df):
+    """High and low tides of a series: readings above (below) both neighbours
+
+    Works on the scraped turning points as well as on a predicted curve. Returns the
+    extreme rows with a kind column, 'high' or 'low'.
+    """
+    df = df[['datetime', 'tide_level']].sort_values('datetime').reset_index(drop=True)
+    levels = df['tide_level'].to_numpy()
+
+    # sign of the slope on either side, plateaus take the sign of the next change
+    slope = np.sign(np.diff(levels))
+    slope = pd.Series(np.where(slope == 0, np.nan, slope)).bfill().fillna(0).to_numpy()
+    turns = np.flatnonzero(slope[:-1] != slope[1:]) + 1
+
+    result = df.iloc[turns].copy()
+    result['kind'] = np.where(slope[turns] < 0, 'high', 'low')
+    return result.reset_index(drop=True)
+
+
+def tide_events(df, start, end):
+    """High and low tides from start to end, with one more on either side
+
+    Uses the readings when they cover the period, otherwise a harmonic model fitted to
+    them is evaluated at one-minute resolution, e.g. for a date after the last scrape.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    margin = pd.Timedelta('1D')
+    times = df['datetime']
+
+    if times.min() <= start - margin and times.max() >= end + margin:
+        window = df[(times >= start - margin) & (times <= end + margin)]
+    else:
+        window = fit_harmonics(df).predict_range(start - margin, end + margin, '1min')
+
+    events = extremes(window)
+    stamps = events['datetime']
+    first = max(int((stamps <= start).sum()) - 1, 0)
+    last = int((stamps < end).sum()) + 1
+    return events.iloc[first:last].reset_index(drop=True)
+
+
+def fill_gaps(df, model, freq='1h', max_gap='1D'):
+    """Add predicted readings every freq inside gaps longer than max_gap between readings"""
+    df = df[['datetime', 'tide_level']].sort_values('datetime').reset_index(drop=True)
+    times = df['datetime'].to_numpy()
+
+    gaps = np.flatnonzero(np.diff(times) > pd.Timedelta(max_gap).to_timedelta64())
+    if not len(gaps):
+        return df
+
+    step = pd.Timedelta(freq)
+    filler = [pd.date_range(times[i] + step, times[i + 1] - step, freq=freq) for i in gaps]
+    filler = pd.DatetimeIndex(np.concatenate(filler))
+
+    predicted = pd.DataFrame({'datetime': filler.astype(df['datetime'].dtype),
+                              'tide_level': model.predict(filler).astype(df['tide_level'].dtype)})
+    return pd.concat([df, predicted]).sort_values('datetime').reset_index(drop=True)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Fit tidal constituents to the scraped readings')
+    parser.add_argument('source', nargs='?', default='tides.csv', help='tides.csv or a tides_store.py dataset')
+    parser.add_argument('--model', default='tide_model.json', help='where to save the fitted model')
+    parser.add_argument('--predict', help='write a predicted tide curve to this csv')
+    parser.add_argument('--freq', default='1min', help='resolution of the predicted curve')
+    args = parser.parse_args()
+
+    from tides_store import load_source
+    df = load_source(args.source)
+
+    model = fit_harmonics(df)
+    residual = df['tide_level'].to_numpy() - model.predict(df['datetime'])
+    print(model.constituents().sort_values('amplitude', ascending=False).round(3))
+    print(f"Mean level {model.mean:.3f} m, RMS error {np.sqrt(np.mean(residual ** 2)):.3f} m")
+
+    model.save(args.model)
+    print(f"Model saved as {args.model}")
+
+    if args.predict:
+        from tides_table import write_csv
+        curve = model.predict_range(df['datetime'].min(), df['datetime'].max(), args.freq)
+        write_csv(curve, args.predict, header="Date,Height", float_format='%.2f')
+        print(f"Predicted {len(curve)} readings saved as {args.predict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import dotenv
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from scraping_utils import get_cache
+from tides_table import read_tide_table
+
+# year-partitioned parquet dataset, one year=YYYY directory per year
+DATASET_DIR = 'tides_dataset'
+
+SCHEMA = pa.schema([
+    ('datetime', pa.timestamp('s')),
+    ('tide_level', pa.float32()),
+    ('year', pa.int32()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('year', pa.int32())]), flavor='hive')
+
+
+def year_url(year):
+    """Build the page url for a year from URL_TEMPLATE, or the un-interpolated URL in .env"""
+    template = os.getenv('URL_TEMPLATE') or dotenv.dotenv_values(interpolate=False).get('URL')
+    if not template or ('${YEAR}' not in template and '{year}' not in template):
+        raise ValueError("Set URL_TEMPLATE (or URL in .env) with a ${YEAR} or {year} placeholder")
+    return template.replace('${YEAR}', str(year)).replace('{year}', str(year))
+
+
+def fetch_year(year):
+    """Fetch (or revalidate) the page of a year into the cache and return its cache entry"""
+    filename = os.getenv('FILENAME', "crawled-page-{year}.html").format(year=year)
+    return get_cache().fetch(year_url(year), filename)
+
+
+def parse_year(year, entry):
+    """Parse the cached page of a year, runs in a worker process"""
+    dotenv.load_dotenv()
+    with get_cache().open_entry(entry) as page:
+        df = read_tide_table(page, year, os.getenv('ROW_XPATH'), os.getenv('COL_XPATH'))
+
+    return year, df
+
+
+def _dataset(root):
+    return ds.dataset(root, schema=SCHEMA, format='parquet', partitioning=PARTITIONING)
+
+
+def append_year(df, year, root=DATASET_DIR):
+    """Append the readings of a year that are not stored yet, existing files are never rewritten"""
+    df = df[['datetime', 'tide_level']].assign(year=year)
+
+    if os.path.isdir(os.path.join(root, f'year={year}')):
+        stored = _dataset(root).to_table(columns=['datetime'], filter=ds.field('year') == year)
+        df = df[~df['datetime'].isin(stored['datetime'].to_pandas())]
+
+    if df.empty:
+        return 0
+
+    table = pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+    ds.write_dataset(table, root, format='parquet', partitioning=PARTITIONING,
+                     basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+                     existing_data_behavior='overwrite_or_ignore')
+    return len(df)
+
+
+def stored_years(root=DATASET_DIR):
+    """Years that have a partition in the dataset"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(int(name.split('=', 1)[1]) for name in os.listdir(root) if name.startswith('year='))
+
+
+def load_tides(root=DATASET_DIR, columns=('datetime', 'tide_level'), start=None, end=None):
+    """Load readings between start and end (inclusive), only reading the needed columns and partitions"""
+    condition = None
+    if start is not None:
+        start = pd.Timestamp(start)
+        condition = (ds.field('year') >= start.year) & (ds.field('datetime') >= start.to_datetime64())
+    if end is not None:
+        end = pd.Timestamp(end)
+        upper = (ds.field('year') <= end.year) & (ds.field('datetime') <= end.to_datetime64())
+        condition = upper if condition is None else condition & upper
+
+    table = _dataset(root).to_table(columns=list(columns), filter=condition)
+    return table.to_pandas().sort_values('datetime').reset_index(drop=True)
+
+
+def load_source(source):
+    """Load readings from a tides.csv file or a dataset directory
+
+    The csv may start with a Date,Height header (tides_csv.py and tide_harmonics.py
+    write one) or not (plot_tides.py), a first row without a number is skipped.
+    """
+    if os.path.isdir(source):
+        return load_tides(source)
+
+    first = pd.read_csv(source, names=['datetime', 'tide_level'], nrows=1, dtype=str)
+    header = len(first) and pd.to_numeric(first['tide_level'], errors='coerce').isna().all()
+    return pd.read_csv(source, names=['datetime', 'tide_level'], skiprows=1 if header else 0,
+                       parse_dates=['datetime'])
+
+
+def scrape_years(years, root=DATASET_DIR, workers=None):
+    """Scrape years in parallel and append them to the dataset
+
+    Pages are fetched on threads of the parent process, so the http cache and its index
+    have a single owner, and only the parsing runs in worker processes.
+    """
+    dotenv.load_dotenv()
+    with ThreadPoolExecutor(max_workers=workers) as fetchers, ProcessPoolExecutor(max_workers=workers) as pool:
+        fetches = {fetchers.submit(fetch_year, year): year for year in years}
+
+        futures = []
+        for fetch in as_completed(fetches):
+            try:
+                futures.append(pool.submit(parse_year, fetches[fetch], fetch.result()))
+            except Exception as e:
+                print(f"Error fetching year {fetches[fetch]}: {e}")
+
+        # the parent process is the only writer
+        for future in as_completed(futures):
+            try:
+                year, df = future.result()
+            except Exception as e:
+                print(f"Error scraping year: {e}")
+                continue
+
+            added = append_year(df, year, root)
+            print(f"{year}: parsed {len(df)} readings, appended {added}")
+
+
+def main():
+    """Main function"""
+    dotenv.load_dotenv()
+    year = int(os.getenv('YEAR', 2024))
+
+    parser = argparse.ArgumentParser(description='Scrape a range of years into a partitioned parquet dataset')
+    parser.add_argument('--start', type=int, default=year, help='first year to scrape')
+    parser.add_argument('--end', type=int, default=year, help='last year to scrape (inclusive)')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--dataset', default=DATASET_DIR, help='dataset directory')
+    args = parser.parse_args()
+
+    scrape_years(range(args.start, args.end + 1), args.dataset, args.workers)
+    print(f"Dataset {args.dataset} now holds years {stored_years(args.dataset)}")
+
+
+if __name__ == "__main__":
+    main()
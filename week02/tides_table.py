@@ -0,0 +1,154 @@
+import gzip
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from scraping_utils import iterparse
+
+
+def cell_texts(tree, row_xpath, col_xpath):
+    """Get the text of every table cell in one XPath pass, returns (texts, width)"""
+    cells = tree.xpath(f'{row_xpath}/{col_xpath}')
+
+    # number of cells in the first row that has any
+    width = int(tree.xpath(f'count(({row_xpath}[{col_xpath}])[1]/{col_xpath})'))
+
+    return [cell.text_content() for cell in cells], width
+
+
+def stream_cell_texts(source, row_xpath, col_xpath, since=None):
+    """Get the text of every table cell while the page is streamed, returns (texts, width)
+
+    since is an optional (month, day), rows dated before it are skipped without being converted.
+    """
+    texts = []
+    width = 0
+
+    for row in iterparse(source, row_xpath):
+        cells = row.xpath(col_xpath)
+
+        # header rows only have <th> cells
+        if not cells:
+            continue
+
+        if since is not None and len(cells) >= 2:
+            month, day = cells[0].text_content().strip(), cells[1].text_content().strip()
+            if month.isdigit() and day.isdigit() and (int(month), int(day)) < since:
+                continue
+
+        columns = [cell.text_content() for cell in cells]
+
+        width = width or len(columns)
+        if len(columns) != width:
+            raise ValueError(f"Ragged tide table, expected {width} cells per row, got {len(columns)}")
+
+        texts.extend(columns)
+
+    return texts, width
+
+
+def empty_table():
+    """Tide table without any readings"""
+    return pd.DataFrame({'datetime': np.array([], dtype='datetime64[s]'),
+                         'tide_level': np.array([], dtype=np.float32)})
+
+
+def columns_from_cells(texts, width, year):
+    """Convert flat cell texts (month, day, then time/height pairs per row) to datetime and tide_level columns"""
+    if width < 4 or len(texts) % width:
+        raise ValueError(f"{len(texts)} cells do not form rows of {width}")
+
+    table = np.char.strip(np.asarray(texts, dtype=str).reshape(-1, width))
+
+    # keep rows that start with a month and a day
+    table = table[np.char.isdigit(table[:, 0]) & np.char.isdigit(table[:, 1])]
+
+    # midnight of every row as datetime64
+    months = table[:, 0].astype(np.int64) - 1
+    days = table[:, 1].astype(np.int64) - 1
+    dates = (np.datetime64(f'{year}-01', 'M') + months).astype('datetime64[D]') + days
+
+    # HHMM times and heights come in pairs, empty slots are left blank
+    times = table[:, 2::2]
+    heights = table[:, 3::2][:, :times.shape[1]]
+    valid = (np.char.str_len(times) == 4) & np.char.isdigit(times) & (heights != '')
+
+    hhmm = np.where(valid, times, '0').astype(np.int64)
+    minutes = (hhmm // 100 * 60 + hhmm % 100).astype('timedelta64[m]')
+    stamps = dates[:, None].astype('datetime64[m]') + minutes
+
+    df = pd.DataFrame({
+        'datetime': stamps[valid].astype('datetime64[s]'),
+        'tide_level': pd.to_numeric(heights[valid], errors='coerce').astype(np.float32)
+    })
+
+    return df.dropna(subset=['tide_level']).reset_index(drop=True)
+
+
+def read_tide_table(source, year, row_xpath, col_xpath, since=None):
+    """Stream a yearly tide page (binary file or path) into a DataFrame, optionally only from since (month, day)"""
+    texts, width = stream_cell_texts(source, row_xpath, col_xpath, since)
+    if not texts:
+        return empty_table()
+    return columns_from_cells(texts, width, year)
+
+
+def tide_table_from_tree(tree, year, row_xpath, col_xpath):
+    """Convert an already parsed tide page into a DataFrame"""
+    texts, width = cell_texts(tree, row_xpath, col_xpath)
+    if not texts:
+        return empty_table()
+    return columns_from_cells(texts, width, year)
+
+
+def format_csv(df, float_format=None):
+    """Format the datetime and tide_level columns as CSV lines in one vectorized pass"""
+    stamps = np.datetime_as_string(df['datetime'].to_numpy().astype('datetime64[m]'), unit='m')
+    stamps = np.char.replace(stamps, 'T', ' ')
+
+    levels = df['tide_level'].to_numpy().astype(np.float64)
+    if float_format is None:
+        # shortest repr of the 2 decimal reading, e.g. 1.3 or 2.05
+        levels = np.round(levels, 2).astype(str)
+    else:
+        levels = np.char.mod(float_format, levels)
+
+    return np.char.add(np.char.add(stamps, ','), levels)
+
+
+def write_csv(df, filename, header=None, float_format=None, compress=None):
+    """Write the tide table to filename atomically, gzipped when filename ends in .gz
+
+    The whole file is built in memory and written to a temporary file in the same
+    directory, which then replaces filename so readers never see a partial file.
+    """
+    if compress is None:
+        compress = filename.endswith('.gz')
+
+    lines = format_csv(df, float_format)
+    body = '\n'.join(lines) + '\n' if len(lines) else ''
+    if header:
+        body = header + '\n' + body
+    data = body.encode('utf-8')
+
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(filename)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if compress:
+                with gzip.GzipFile(fileobj=f, mode='wb', filename=os.path.basename(filename)) as gz:
+                    gz.write(data)
+            else:
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # mkstemp creates private files, give the csv the usual permissions
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+
+        os.replace(tmp_path, filename)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
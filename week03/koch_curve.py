@@ -1,6 +1,70 @@
+import argparse
+
 import matplotlib.pyplot as plt
 import numpy as np
 
+from lsystem import CURVES, LSystem, bounds, rasterize, write_svg
+
+# position of the bump's tip along a segment, as a fraction of the segment
+ZR = 0.5 - 0.5j * np.sqrt(3) / 3
+
+# start and vector of the four sub-segments, relative to the segment they replace
+SUB_STARTS = np.array([0, 1 / 3, ZR, 2 / 3])
+SUB_VECTORS = np.array([1 / 3, ZR - 1 / 3, 2 / 3 - ZR, 1 / 3])
+
+def koch_vertices(order, scale=10, chunk_size=1 << 16):
+    """
+    Yield the vertices of the Koch snowflake in order, in blocks of complex numbers.
+
+    Vertex i is found from its base 4 digits (one per recursion level) instead of
+    building the lower orders, so memory is bounded by chunk_size at any order.
+
+    Parameters
+    ----------
+    order : int
+        The recursion depth.
+    scale : float
+        The extent of the snowflake (edge length of the base triangle).
+    chunk_size : int
+        Number of vertices per block.
+    """
+    angles = np.array([0, 120, 240]) + 90
+    corners = scale / np.sqrt(3) * np.exp(np.deg2rad(angles) * 1j)
+    edges = np.roll(corners, shift=-1) - corners
+
+    per_edge = 4**order
+    total = 3 * per_edge
+    for start in range(0, total, chunk_size):
+        index = np.arange(start, min(start + chunk_size, total), dtype=np.int64)
+        edge, rest = np.divmod(index, per_edge)
+
+        points = corners[edge]
+        segment = edges[edge]
+        for level in range(order - 1, -1, -1):
+            digit = rest // 4**level % 4
+            points = points + segment * SUB_STARTS[digit]
+            segment = segment * SUB_VECTORS[digit]
+
+        yield points
+
+def memmap_vertices(chunks, count, filename):
+    """
+    Write count vertices from a stream of blocks into a memory-mapped complex128 file.
+
+    Returns the np.memmap, which can be sliced without loading the whole file.
+    """
+    points = np.memmap(filename, dtype=np.complex128, mode='w+', shape=(count,))
+    start = 0
+    for block in chunks:
+        points[start:start + len(block)] = block
+        start += len(block)
+    points.flush()
+    return points
+
+def koch_memmap(order, filename, scale=10, chunk_size=1 << 16):
+    """Write the vertices of the Koch snowflake into a memory-mapped complex128 file"""
+    return memmap_vertices(koch_vertices(order, scale, chunk_size), 3 * 4**order, filename)
+
 def koch_snowflake(order, scale=10):
     """
     Return two lists x, y of point coordinates of the Koch snowflake.
@@ -12,32 +76,53 @@ def koch_snowflake(order, scale=10):
     scale : float
         The extent of the snowflake (edge length of the base triangle).
     """
-    def _koch_snowflake_complex(order):
-        if order == 0:
-            # initial triangle
-            angles = np.array([0, 120, 240]) + 90
-            return scale / np.sqrt(3) * np.exp(np.deg2rad(angles) * 1j)
-        else:
-            ZR = 0.5 - 0.5j * np.sqrt(3) / 3
-
-            p1 = _koch_snowflake_complex(order - 1)  # start points
-            p2 = np.roll(p1, shift=-1)  # end points
-            dp = p2 - p1  # connection vectors
-
-            new_points = np.empty(len(p1) * 4, dtype=np.complex128)
-            new_points[::4] = p1
-            new_points[1::4] = p1 + dp / 3
-            new_points[2::4] = p1 + dp * ZR
-            new_points[3::4] = p1 + dp / 3 * 2
-            return new_points
-
-    points = _koch_snowflake_complex(order)
+    points = np.concatenate(list(koch_vertices(order, scale)))
     x, y = points.real, points.imag
     return x, y
 
-x, y = koch_snowflake(order=7)
+def main():
+    parser = argparse.ArgumentParser(description='Draw the Koch snowflake or another L-system curve')
+    parser.add_argument('--order', type=int, default=7, help='recursion depth')
+    parser.add_argument('--curve', default='snowflake', choices=['snowflake', *CURVES],
+                        help='snowflake uses the direct vertex formula, the others the L-system engine')
+    parser.add_argument('--svg', help='stream the curve into this SVG file')
+    parser.add_argument('--precision', type=int, default=2, help='decimals kept in the SVG path')
+    parser.add_argument('--png', help='rasterize the curve into this PNG file')
+    parser.add_argument('--size', type=int, default=2048, help='PNG size in pixels')
+    parser.add_argument('--memmap', help='write the curve vertices into this raw complex128 file')
+    args = parser.parse_args()
+
+    # every output streams the vertices again instead of keeping them
+    if args.curve == 'snowflake':
+        count = 3 * 4**args.order
+
+        def chunks():
+            return koch_vertices(args.order)
+    else:
+        system = LSystem.named(args.curve)
+        count = system.vertex_count(args.order)
+        print(f"{args.curve} order {args.order}: {count} vertices")
+
+        def chunks():
+            return system.vertices(args.order)
+
+    if args.memmap:
+        points = memmap_vertices(chunks(), count, args.memmap)
+        print(f"Wrote {len(points)} vertices to {args.memmap}")
+    if args.svg:
+        write_svg(chunks(), args.svg, precision=args.precision)
+        print(f"Saved {args.svg}")
+    if args.png:
+        image = rasterize(chunks(), bounds(chunks()), args.size)
+        plt.imsave(args.png, image > 0, cmap='binary', origin='lower')
+        print(f"Saved {args.png}")
+
+    if not (args.svg or args.png or args.memmap):
+        points = np.concatenate(list(chunks()))
+        plt.figure(figsize=(8, 8))
+        plt.axis('equal')
+        plt.fill(points.real, points.imag)
+        plt.show()
 
-plt.figure(figsize=(8, 8))
-plt.axis('equal')
-plt.fill(x, y)
-plt.show()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
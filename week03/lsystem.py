@@ -0,0 +1,203 @@
+"""A small L-system engine that streams curves in bounded memory.
+
+The symbol string of order n is never built: it is expanded depth first and handed
+out in numpy blocks, and the turtle walks every block with cumulative sums.
+Only non-branching systems are supported (no '[' and ']').
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# name -> (axiom, rules, angle in degrees, drawing symbols)
+CURVES = {
+    'koch': ('F--F--F', {'F': 'F+F--F+F'}, 60, 'F'),
+    'koch_curve': ('F', {'F': 'F+F--F+F'}, 60, 'F'),
+    'dragon': ('FX', {'X': 'X+YF+', 'Y': '-FX-Y'}, 90, 'F'),
+    'levy': ('F', {'F': '+F--F+'}, 45, 'F'),
+    'sierpinski_arrowhead': ('A', {'A': 'B-A-B', 'B': 'A+B+A'}, 60, 'AB'),
+    'hilbert': ('A', {'A': '+BF-AFA-FB+', 'B': '-AF+BFB+FA-'}, 90, 'F'),
+    'gosper': ('A', {'A': 'A-B--B+A++AA+B-', 'B': '+A-BB--B-A++A+B'}, 60, 'AB'),
+}
+
+class LSystem:
+    """Rewriting system plus turtle, the symbols in draw move forward, + turns left, - turns right"""
+
+    def __init__(self, axiom, rules, angle, draw='FABG'):
+        if '[' in axiom or any('[' in rule for rule in rules.values()):
+            raise ValueError("Branching L-systems are not supported")
+
+        self.axiom = axiom
+        self.rules = rules
+        self.angle = angle
+        self.alphabet = sorted(set(axiom).union(*rules, *rules.values()))
+        self.codes = {symbol: code for code, symbol in enumerate(self.alphabet)}
+        self.draws = np.array([symbol in draw for symbol in self.alphabet])
+        self.turns = np.array([{'+': 1, '-': -1}.get(symbol, 0) for symbol in self.alphabet])
+
+        # exact headings when the angle divides the full turn
+        self.steps = round(360 / angle) if abs(360 / angle - round(360 / angle)) < 1e-9 else None
+
+    @classmethod
+    def named(cls, name):
+        axiom, rules, angle, draw = CURVES[name]
+        return cls(axiom, rules, angle, draw)
+
+    @lru_cache(maxsize=None)
+    def length(self, symbol, depth):
+        """Number of symbols symbol expands to after depth rewrites"""
+        if depth == 0 or symbol not in self.rules:
+            return 1
+        return sum(self.length(child, depth - 1) for child in self.rules[symbol])
+
+    @lru_cache(maxsize=None)
+    def _block(self, symbol, depth):
+        """Whole expansion of a symbol as codes, only used for small expansions"""
+        if depth == 0 or symbol not in self.rules:
+            return np.array([self.codes[symbol]], dtype=np.int8)
+        return np.concatenate([self._block(child, depth - 1) for child in self.rules[symbol]])
+
+    def _expand(self, symbol, depth, block_size):
+        if self.length(symbol, depth) <= block_size:
+            yield self._block(symbol, depth)
+            return
+        for child in self.rules[symbol]:
+            yield from self._expand(child, depth - 1, block_size)
+
+    def symbols(self, order, block_size=1 << 16):
+        """Symbol codes of the order-th rewrite of the axiom, in blocks of about block_size"""
+        pending, size = [], 0
+        for symbol in self.axiom:
+            for block in self._expand(symbol, order, block_size):
+                pending.append(block)
+                size += len(block)
+                if size >= block_size:
+                    yield np.concatenate(pending)
+                    pending, size = [], 0
+        if pending:
+            yield np.concatenate(pending)
+
+    @lru_cache(maxsize=None)
+    def _count(self, symbol, depth):
+        """Number of drawing symbols symbol expands to after depth rewrites"""
+        if depth == 0 or symbol not in self.rules:
+            return int(self.draws[self.codes[symbol]])
+        return sum(self._count(child, depth - 1) for child in self.rules[symbol])
+
+    def vertex_count(self, order):
+        """Number of vertices the curve of an order has, including the start point"""
+        return 1 + sum(self._count(symbol, order) for symbol in self.axiom)
+
+    def vertices(self, order, step=1.0, start=0j, heading=0.0, block_size=1 << 16):
+        """Yield the vertices of the curve as blocks of complex numbers, starting with start"""
+        position = complex(start)
+        turn = 0
+        yield np.array([position])
+
+        if self.steps:
+            directions = step * np.exp(1j * (np.radians(heading) + 2 * np.pi * np.arange(self.steps) / self.steps))
+
+        for codes in self.symbols(order, block_size):
+            turns = turn + np.cumsum(self.turns[codes])
+            draws = self.draws[codes]
+
+            if self.steps:
+                moves = directions[turns[draws] % self.steps]
+            else:
+                moves = step * np.exp(1j * np.radians(heading + self.angle * turns[draws]))
+
+            points = position + np.cumsum(moves)
+            if len(points):
+                position = points[-1]
+                yield points
+            turn = int(turns[-1])
+
+def bounds(chunks):
+    """(xmin, ymin, xmax, ymax) of a stream of vertex blocks"""
+    xmin = ymin = np.inf
+    xmax = ymax = -np.inf
+    for points in chunks:
+        xmin, xmax = min(xmin, points.real.min()), max(xmax, points.real.max())
+        ymin, ymax = min(ymin, points.imag.min()), max(ymax, points.imag.max())
+    return xmin, ymin, xmax, ymax
+
+def write_svg(chunks, filename, size=800, precision=2, stroke='black', stroke_width=1, fill='none'):
+    """Stream vertex blocks into one SVG path, memory stays bounded by a block
+
+    Coordinates are written as integers relative to the previous vertex on a grid of
+    10**-precision, the path is scaled back with a transform. Vertices that fall on
+    the same grid point as the previous one are dropped. The viewBox is only known
+    at the end, so a padded placeholder is patched in afterwards.
+    """
+    scale = 10 ** precision
+    placeholder = ' ' * 80
+    xmin = ymin = np.inf
+    xmax = ymax = -np.inf
+    last = None
+
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" ')
+        offset = f.tell()
+        f.write(f'viewBox="{placeholder}">\n')
+        f.write(f'<path fill="{fill}" stroke="{stroke}" stroke-width="{stroke_width}" '
+                f'vector-effect="non-scaling-stroke" transform="scale({1 / scale:g})" d="')
+
+        for points in chunks:
+            # flip y so the curve is not drawn upside down
+            qx = np.round(points.real * scale).astype(np.int64)
+            qy = np.round(-points.imag * scale).astype(np.int64)
+            xmin, xmax = min(xmin, qx.min()), max(xmax, qx.max())
+            ymin, ymax = min(ymin, qy.min()), max(ymax, qy.max())
+
+            if last is None:
+                f.write(f'M{qx[0]} {qy[0]}l')
+                last = (qx[0], qy[0])
+                qx, qy = qx[1:], qy[1:]
+
+            if len(qx):
+                dx, dy = np.diff(qx, prepend=last[0]), np.diff(qy, prepend=last[1])
+                last = (qx[-1], qy[-1])
+
+                # steps below the precision vanish instead of being written as 0 0
+                moved = (dx != 0) | (dy != 0)
+                steps = np.column_stack([dx[moved], dy[moved]]).ravel()
+                if len(steps):
+                    f.write(' '.join(map(str, steps.tolist())).replace(' -', '-') + ' ')
+
+        f.write('"/>\n</svg>\n')
+
+        margin = max(xmax - xmin, ymax - ymin) * 0.02
+        view_box = (f'{(xmin - margin) / scale:g} {(ymin - margin) / scale:g} '
+                    f'{(xmax - xmin + 2 * margin) / scale:g} {(ymax - ymin + 2 * margin) / scale:g}')
+        f.seek(offset)
+        f.write(f'viewBox="{view_box:<80}">')
+
+def rasterize(chunks, extent, size=1024):
+    """Draw vertex blocks as connected lines into a size x size hit-count image covering extent
+
+    extent is (xmin, ymin, xmax, ymax). Every segment is sampled about once per pixel,
+    only one block (and its samples) is in memory at a time.
+    """
+    xmin, ymin, xmax, ymax = extent
+    span = max(xmax - xmin, ymax - ymin) or 1
+    image = np.zeros(size * size, dtype=np.int64)
+    last = None
+
+    for points in chunks:
+        pixels = (points - complex(xmin, ymin)) / span * (size - 1)
+        if last is not None:
+            pixels = np.concatenate([[last], pixels])
+        last = pixels[-1]
+
+        # samples along every segment, one per pixel of its length
+        starts, vectors = pixels[:-1], np.diff(pixels)
+        samples = np.ceil(np.abs(vectors)).astype(np.int64) + 1
+        segment = np.repeat(np.arange(len(starts)), samples)
+        fraction = (np.arange(len(segment)) - np.repeat(np.cumsum(samples) - samples, samples)) / samples[segment]
+        line = np.concatenate([starts[segment] + vectors[segment] * fraction, pixels[-1:]])
+
+        x = np.round(line.real).astype(np.int64)
+        y = np.round(line.imag).astype(np.int64)
+        inside = (x >= 0) & (x < size) & (y >= 0) & (y < size)
+        image += np.bincount(y[inside] * size + x[inside], minlength=size * size)
+
+    return image.reshape(size, size)
@@ -1,3 +1,6 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -9,17 +12,76 @@ def mandelbrot(c, max_iter):
         n += 1
     return n
 
-def mandelbrot_set(xmin, xmax, ymin, ymax, width, height, max_iter):
+def escape_time(c, max_iter, smooth=False):
+    """Vectorized mandelbrot() for an array of points
+
+    Every iteration only updates the points that have not escaped yet. Points in the
+    main cardioid and the period-2 bulb never escape and are skipped up front.
+    With smooth=True the count gets a fractional part (n + 1 - log2(log|z|)) so the
+    colors do not band.
+    """
+    c = np.asarray(c, dtype=np.complex128)
+    shape = c.shape
+    c = c.ravel()
+    counts = np.full(c.shape, max_iter, dtype=np.float64 if smooth else np.int64)
+
+    # cardioid and bulb test
+    q = (c.real - 0.25)**2 + c.imag**2
+    inside = (q * (q + (c.real - 0.25)) <= 0.25 * c.imag**2) | ((c.real + 1)**2 + c.imag**2 <= 1/16)
+
+    active = np.flatnonzero(~inside)
+    z = np.zeros(len(active), dtype=np.complex128)
+    points = c[active]
+
+    for n in range(1, max_iter + 1):
+        z = z*z + points
+        escaped = z.real**2 + z.imag**2 > 4
+
+        if escaped.any():
+            if smooth:
+                counts[active[escaped]] = np.minimum(n + 1 - np.log2(np.log(np.abs(z[escaped]))), max_iter)
+            else:
+                counts[active[escaped]] = n
+
+            # drop the escaped points so later iterations get cheaper
+            keep = ~escaped
+            active, z, points = active[keep], z[keep], points[keep]
+
+        if not len(active):
+            break
+
+    return counts.reshape(shape)
+
+def _render_tile(xmin, xmax, ymin, ymax, width, height, max_iter, smooth, row_start, row_end):
+    """Escape times of the rows row_start:row_end of the image, runs in a worker process"""
+    r1 = np.linspace(xmin, xmax, width)
+    r2 = np.linspace(ymin, ymax, height)[row_start:row_end]
+    return escape_time(r1[np.newaxis, :] + 1j * r2[:, np.newaxis], max_iter, smooth)
+
+def mandelbrot_set(xmin, xmax, ymin, ymax, width, height, max_iter, smooth=False, workers=None, tile_rows=128):
+    """Escape times of a width x height grid, rendered in bands of tile_rows rows on workers processes"""
     r1 = np.linspace(xmin, xmax, width)
     r2 = np.linspace(ymin, ymax, height)
-    return (r1, r2, np.array([[mandelbrot(complex(r, i), max_iter) for r in r1] for i in r2]))
 
-def display(xmin, xmax, ymin, ymax, width, height, max_iter):
-    r1, r2, mandelbrot_image = mandelbrot_set(xmin, xmax, ymin, ymax, width, height, max_iter)
-    plt.imshow(mandelbrot_image, extent=(xmin, xmax, ymin, ymax), cmap='hot')
+    workers = workers or os.cpu_count() or 1
+    starts = range(0, height, tile_rows)
+    args = [(xmin, xmax, ymin, ymax, width, height, max_iter, smooth, start, min(start + tile_rows, height))
+            for start in starts]
+
+    if workers == 1 or len(args) == 1:
+        tiles = [_render_tile(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            tiles = list(pool.map(_render_tile, *zip(*args)))
+
+    return (r1, r2, np.vstack(tiles))
+
+def display(xmin, xmax, ymin, ymax, width, height, max_iter, smooth=True, workers=None):
+    r1, r2, mandelbrot_image = mandelbrot_set(xmin, xmax, ymin, ymax, width, height, max_iter, smooth, workers)
+    plt.imshow(mandelbrot_image, extent=(xmin, xmax, ymin, ymax), cmap='hot', origin='lower')
     plt.colorbar()
     plt.title("Mandelbrot Set")
     plt.show()
 
 if __name__ == "__main__":
-    display(-2.0, 1.0, -1.5, 1.5, 2000, 2000, 100)
\ No newline at end of file
+    display(-2.0, 1.0, -1.5, 1.5, 2000, 2000, 100)
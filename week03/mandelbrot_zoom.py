@@ -0,0 +1,298 @@
+"""Interactive deep zoom into the Mandelbrot set using perturbation theory.
+
+Only the centre of every tile is iterated in high precision (decimal), every pixel
+then follows the small difference to that reference orbit in ordinary doubles:
+
+    delta' = 2 * Z * delta + delta**2 + dc
+
+When a pixel gets closer to zero than to the reference (or the reference escapes)
+it is rebased onto the start of the orbit, which keeps the doubles accurate.
+This works down to pixel sizes around 1e-300 instead of 1e-16 for plain doubles.
+
+Scroll to zoom around the mouse, click to recenter, +/- to zoom, arrows to pan.
+"""
+import argparse
+from collections import OrderedDict
+from decimal import Decimal, localcontext
+from fractions import Fraction
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+# pixels per tile side, tiles at zoom level k split [-2, 2] x [-2, 2] into 2**k x 2**k
+TILE = 256
+
+def pixel_size(zoom):
+    """Exact size of a pixel at a zoom level"""
+    return Fraction(4, 2**zoom * TILE)
+
+def auto_max_iter(zoom):
+    """Deeper views need more iterations to show their detail"""
+    return 100 + 40 * zoom
+
+def reference_orbit(cx, cy, max_iter, digits):
+    """Iterate the tile centre with digits of precision, returns Z_0 .. Z_n as complex128
+
+    Stops after max_iter iterations or once the orbit escapes.
+    """
+    with localcontext() as ctx:
+        ctx.prec = digits
+        cr = Decimal(cx.numerator) / Decimal(cx.denominator)
+        ci = Decimal(cy.numerator) / Decimal(cy.denominator)
+        zr = zi = Decimal(0)
+        orbit = [0j]
+
+        for _ in range(max_iter):
+            zr, zi = zr*zr - zi*zi + cr, 2*zr*zi + ci
+            z = complex(float(zr), float(zi))
+            orbit.append(z)
+            if z.real**2 + z.imag**2 > 4:
+                break
+
+    return np.array(orbit)
+
+def perturbation_escape(orbit, dc, max_iter, smooth=True):
+    """Escape times of the points reference + dc, iterated as deltas to the orbit"""
+    counts = np.full(dc.shape, max_iter, dtype=np.float64 if smooth else np.int64)
+    last = len(orbit) - 1
+
+    active = np.arange(dc.size)
+    dc = dc.ravel()
+    delta = np.zeros(dc.size, dtype=np.complex128)
+    ref = np.zeros(dc.size, dtype=np.int64)
+
+    for n in range(1, max_iter + 1):
+        delta = 2 * orbit[ref] * delta + delta * delta + dc
+        ref += 1
+        z = orbit[ref] + delta
+        abs2 = z.real**2 + z.imag**2
+
+        escaped = abs2 > 4
+        if escaped.any():
+            if smooth:
+                counts.flat[active[escaped]] = np.minimum(n + 1 - np.log2(0.5 * np.log(abs2[escaped])), max_iter)
+            else:
+                counts.flat[active[escaped]] = n
+
+            keep = ~escaped
+            active, dc, delta, ref, z, abs2 = active[keep], dc[keep], delta[keep], ref[keep], z[keep], abs2[keep]
+            if not len(active):
+                break
+
+        # rebase onto the start of the orbit when z is closer to zero than to the reference
+        rebase = (abs2 < delta.real**2 + delta.imag**2) | (ref == last)
+        delta[rebase] = z[rebase]
+        ref[rebase] = 0
+
+    return counts
+
+def render_tile(zoom, x, y, max_iter, size=TILE, smooth=True):
+    """Render tile (x, y) of a zoom level at size x size pixels, row 0 at the bottom"""
+    pixel = pixel_size(zoom)
+    cx = -2 + (x * TILE + Fraction(TILE, 2)) * pixel
+    cy = -2 + (y * TILE + Fraction(TILE, 2)) * pixel
+
+    # enough digits for the pixel size plus some guard digits
+    digits = int(zoom * 0.31) + 20
+    orbit = reference_orbit(cx, cy, max_iter, digits)
+
+    # pixel offsets from the centre, small enough for doubles
+    step = float(pixel) * TILE / size
+    offsets = (np.arange(size) - size / 2 + 0.5) * step
+    dc = offsets[np.newaxis, :] + 1j * offsets[:, np.newaxis]
+
+    return perturbation_escape(orbit, dc, max_iter, smooth)
+
+class TileCache:
+    """Least recently used cache of rendered tiles keyed by (zoom, x, y, max_iter)"""
+
+    def __init__(self, max_tiles=512):
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+
+    def get(self, key):
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        self.tiles[key] = tile
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+
+    def tile(self, zoom, x, y, max_iter):
+        """Cached tile, rendered on a miss"""
+        key = (zoom, x, y, max_iter)
+        tile = self.get(key)
+        if tile is None:
+            tile = render_tile(zoom, x, y, max_iter)
+            self.put(key, tile)
+        return tile
+
+def view_tiles(center, width, height):
+    """Tiles covering a width x height view around center (global pixel x, y), closest first
+
+    Yields (x, y, left, bottom) where left/bottom is the tile's pixel offset in the view.
+    """
+    left = center[0] - width // 2
+    bottom = center[1] - height // 2
+    tiles = []
+    for ty in range(bottom // TILE, (bottom + height - 1) // TILE + 1):
+        for tx in range(left // TILE, (left + width - 1) // TILE + 1):
+            distance = (tx * TILE + TILE / 2 - center[0])**2 + (ty * TILE + TILE / 2 - center[1])**2
+            tiles.append((distance, tx, ty))
+
+    for _, tx, ty in sorted(tiles):
+        yield tx, ty, tx * TILE - left, ty * TILE - bottom
+
+def paste(canvas, tile, left, bottom):
+    """Copy the part of a tile that lies inside the canvas"""
+    height, width = canvas.shape
+    scale = TILE // tile.shape[0]
+    if scale > 1:
+        tile = np.repeat(np.repeat(tile, scale, axis=0), scale, axis=1)
+
+    x0, y0 = max(left, 0), max(bottom, 0)
+    x1, y1 = min(left + TILE, width), min(bottom + TILE, height)
+    if x0 < x1 and y0 < y1:
+        canvas[y0:y1, x0:x1] = tile[y0 - bottom:y1 - bottom, x0 - left:x1 - left]
+
+def render_view(center, zoom, width, height, max_iter=None, cache=None):
+    """Render a whole view without showing it, e.g. to save a deep zoom image"""
+    max_iter = max_iter or auto_max_iter(zoom)
+    cache = cache if cache is not None else TileCache()
+    canvas = np.zeros((height, width))
+    for tx, ty, left, bottom in view_tiles(center, width, height):
+        paste(canvas, cache.tile(zoom, tx, ty, max_iter), left, bottom)
+    return canvas
+
+def center_pixel(re, im, zoom):
+    """Global pixel under the point re + i im (decimal strings) at a zoom level"""
+    pixel = pixel_size(zoom)
+    x = (Fraction(Decimal(re)) + 2) / pixel
+    y = (Fraction(Decimal(im)) + 2) / pixel
+    return x.numerator // x.denominator, y.numerator // y.denominator
+
+class ZoomViewer:
+    """Matplotlib window that renders the view progressively, previews first, centre tiles first"""
+
+    def __init__(self, center=(TILE // 2, TILE // 2), zoom=0, width=768, height=768, max_iter=None,
+                 preview=32, cache=None):
+        self.center = center
+        self.zoom = zoom
+        self.width = width
+        self.height = height
+        self.fixed_max_iter = max_iter
+        self.preview = preview
+        self.cache = cache if cache is not None else TileCache()
+        self.generation = 0
+
+        self.fig = plt.figure(figsize=(width / 100, height / 100))
+        self.ax = self.fig.add_axes([0, 0, 1, 1], frameon=False)
+        self.ax.set_xticks([]), self.ax.set_yticks([])
+        self.canvas = np.zeros((height, width))
+        self.image = self.ax.imshow(self.canvas, cmap='hot', origin='lower', interpolation='nearest')
+
+        self.fig.canvas.mpl_connect('scroll_event', self.on_scroll)
+        self.fig.canvas.mpl_connect('button_press_event', self.on_click)
+        self.fig.canvas.mpl_connect('key_press_event', self.on_key)
+
+    @property
+    def max_iter(self):
+        return self.fixed_max_iter or auto_max_iter(self.zoom)
+
+    def view_pixel(self, event):
+        """Global pixel under a mouse event"""
+        left = self.center[0] - self.width // 2
+        bottom = self.center[1] - self.height // 2
+        return left + int(event.xdata), bottom + int(event.ydata)
+
+    def zoom_at(self, pixel, levels):
+        """Zoom in (levels > 0) or out keeping pixel under the same spot of the window"""
+        if self.zoom + levels < 0:
+            return
+        factor = 2**levels
+        offset = (self.center[0] - pixel[0], self.center[1] - pixel[1])
+        if levels > 0:
+            self.center = (pixel[0] * factor + offset[0], pixel[1] * factor + offset[1])
+        else:
+            self.center = (pixel[0] // 2**-levels + offset[0], pixel[1] // 2**-levels + offset[1])
+        self.zoom += levels
+        self.redraw()
+
+    def on_scroll(self, event):
+        if event.xdata is not None:
+            self.zoom_at(self.view_pixel(event), 1 if event.button == 'up' else -1)
+
+    def on_click(self, event):
+        if event.xdata is not None and event.button == 1:
+            self.center = self.view_pixel(event)
+            self.redraw()
+
+    def on_key(self, event):
+        step = self.width // 4
+        moves = {'left': (-step, 0), 'right': (step, 0), 'up': (0, step), 'down': (0, -step)}
+        if event.key in ('+', '='):
+            self.zoom_at(self.center, 1)
+        elif event.key == '-':
+            self.zoom_at(self.center, -1)
+        elif event.key in moves:
+            dx, dy = moves[event.key]
+            self.center = (self.center[0] + dx, self.center[1] + dy)
+            self.redraw()
+
+    def show_progress(self):
+        self.image.set_data(self.canvas)
+        self.image.set_clim(self.canvas.min(), self.canvas.max())
+        plt.pause(0.001)
+
+    def redraw(self):
+        """Fill the view tile by tile, stopping early when the user moved on in the meantime"""
+        self.generation += 1
+        generation = self.generation
+        zoom, max_iter = self.zoom, self.max_iter
+        tiles = list(view_tiles(self.center, self.width, self.height))
+
+        pixel = float(pixel_size(zoom))
+        self.ax.set_title(f'zoom 2^{zoom}, pixel {pixel:.3g}, max_iter {max_iter}', fontsize=9, color='gray')
+
+        # quick low resolution pass for the tiles that are not cached yet
+        for tx, ty, left, bottom in tiles:
+            tile = self.cache.get((zoom, tx, ty, max_iter))
+            if tile is None:
+                tile = render_tile(zoom, tx, ty, max_iter, size=self.preview)
+            paste(self.canvas, tile, left, bottom)
+        self.show_progress()
+
+        for tx, ty, left, bottom in tiles:
+            if generation != self.generation:
+                return
+            paste(self.canvas, self.cache.tile(zoom, tx, ty, max_iter), left, bottom)
+            self.show_progress()
+
+def main():
+    parser = argparse.ArgumentParser(description='Deep zoom into the Mandelbrot set')
+    parser.add_argument('--re', default='-0.5', help='real part of the view centre (any precision)')
+    parser.add_argument('--im', default='0', help='imaginary part of the view centre (any precision)')
+    parser.add_argument('--zoom', type=int, default=0, help='zoom level, the view is about 4 / 2**zoom wide')
+    parser.add_argument('--max-iter', type=int, default=None, help='iterations (default grows with zoom)')
+    parser.add_argument('--size', type=int, default=768, help='view size in pixels')
+    parser.add_argument('--save', help='render the view to this image file instead of opening a window')
+    args = parser.parse_args()
+
+    center = center_pixel(args.re, args.im, args.zoom)
+
+    if args.save:
+        image = render_view(center, args.zoom, args.size, args.size, args.max_iter)
+        plt.imsave(args.save, image, cmap='hot', origin='lower')
+        print(f"Saved {args.save}")
+        return
+
+    viewer = ZoomViewer(center, args.zoom, args.size, args.size, args.max_iter)
+    viewer.redraw()
+    plt.show()
+
+if __name__ == "__main__":
+    main()
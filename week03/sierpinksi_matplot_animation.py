@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.animation import FuncAnimation
+from matplotlib.colors import LogNorm
 
 # create a figure
 fig = plt.figure(figsize=(7, 7))
@@ -14,9 +15,10 @@ ax.set_ylim(-0.2, 1.2), ax.set_yticks([])
 
 # some parameters you can change!
 max_loop = 100
-vertices = [[0.5, np.sqrt(3)/2], [0, 0], [1, 0]]
-max_runs = 20
-iters = 500 # number of iterations per run
+vertices = np.array([[0.5, np.sqrt(3)/2], [0, 0], [1, 0]])
+points_per_frame = 500_000 # number of chaos game points per frame
+resolution = 700 # pixels of the density image
+fade = 0.95 # how much of the old density survives each frame, 1 keeps everything
 
 # draw equilateral triangle
 triangle = plt.Polygon(vertices, fill=None)
@@ -24,26 +26,46 @@ triangle = plt.Polygon(vertices, fill=None)
 # add it to the axes
 ax.add_patch(triangle)
 
-# declare variable to store the points
-runs = []
+# every point moves halfway to a random vertex: p[n] = p[n-1]/2 + v[n]/2
+# unrolled, p[n] = sum over j of v[n-j] / 2**(j+1), and after 53 halvings the
+# older terms are below double precision, so the whole run is one convolution
+memory = 53
+weights = 0.5 ** np.arange(1, memory + 1)
+
+rng = np.random.default_rng()
+
+# the last vertices of the previous frame, so runs continue across frames
+history = vertices[rng.integers(0, 3, memory)]
+
+def chaos_game(n):
+    """Generate n chaos game points, continuing from the previous call"""
+    global history
+    chosen = np.concatenate([history, vertices[rng.integers(0, 3, n)]])
+    history = chosen[-memory:]
+
+    x = np.convolve(chosen[:, 0], weights, mode='valid')[1:]
+    y = np.convolve(chosen[:, 1], weights, mode='valid')[1:]
+    return x, y
+
+# density of all points so far, shown with a single image artist
+extent = (-0.2, 1.2, -0.2, 1.2)
+density = np.zeros((resolution, resolution))
+image = ax.imshow(np.ma.masked_equal(density, 0), extent=extent, origin='lower',
+                  cmap='viridis', norm=LogNorm(vmin=1, vmax=10), interpolation='nearest')
 
 def update(frame):
 
-    global max_loop
-    global runs
+    global density
 
     frame = frame % max_loop
 
-    pos_x = [0]
-    pos_y = [0]
-    
-    for _ in range(iters):
-        # get a random vertex
-        vertex = vertices[np.random.randint(0, 3)]
+    x, y = chaos_game(points_per_frame)
 
-        # from the last position move halfway to the vertex
-        pos_x.append(0.5*(pos_x[-1]+vertex[0]))
-        pos_y.append(0.5*(pos_y[-1]+vertex[1]))
+    # bin the new points with one bincount and fade the old ones
+    col = ((x - extent[0]) / (extent[1] - extent[0]) * resolution).astype(np.int64)
+    row = ((y - extent[2]) / (extent[3] - extent[2]) * resolution).astype(np.int64)
+    counts = np.bincount(row * resolution + col, minlength=resolution * resolution)
+    density = density * fade + counts.reshape(resolution, resolution)
 
     # create a color based on the frame value
     triangle_color = plt.cm.viridis(1 - frame/max_loop)
@@ -51,24 +73,14 @@ def update(frame):
     # set the color of the triangle
     triangle.set_edgecolor(triangle_color)
 
-    # create a color based on the frame value
-    run_color = plt.cm.viridis(frame/max_loop)
-
-    # plot the run with a color based on the frame value
-    run = ax.scatter(pos_x, pos_y, color=run_color,s=2)
+    # show the density, empty pixels stay transparent
+    image.set_data(np.ma.masked_less(density, 1))
+    image.set_clim(1, max(density.max(), 10))
 
-    # add the run to the list of runs
-    runs.append(run)
-    
-    # remove the first run if we have more than max_runs
-    if len(runs) > max_runs:
-        # remove oldest one from the plot
-        runs[0].remove()
-        # remove oldest one from the list
-        runs.pop(0)
+    return image, triangle
 
 # create the animation
-animation = FuncAnimation(fig, update, interval=10, cache_frame_data=False)
+animation = FuncAnimation(fig, update, interval=10, blit=True, cache_frame_data=False)
 
 # show the plot
-plt.show()
\ No newline at end of file
+plt.show()
@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.animation import FuncAnimation
+from matplotlib.collections import LineCollection
 
 fig = plt.figure(figsize=(7, 7))
 ax = fig.add_axes([0, 0, 1, 1], frameon=False)
@@ -17,8 +18,31 @@ full_circle_radius = 1
 number_of_lines = 200
 scale = 30
 
+# ring buffer of the visible lines, drawn by one LineCollection that is updated in place
+segments = [np.empty((0, 2))] * number_of_lines
+colors = np.zeros((number_of_lines, 4))
+oldest = 0
+visible = 0
+lines = LineCollection([], linewidths=1.5)
+ax.add_collection(lines)
+
+def add_line(x, y, color):
+    """Put a line in the ring, overwriting the oldest one when it is full"""
+    global oldest, visible
+    slot = (oldest + visible) % number_of_lines
+    segments[slot] = np.column_stack([x, y])
+    colors[slot] = color
+    if visible == number_of_lines:
+        oldest = (oldest + 1) % number_of_lines
+    else:
+        visible += 1
+
+def init():
+    return circle1, lines
+
 reverse = False
 def update(frame):
+    global oldest, visible
     global reverse
     # reverse the animation when reaching the end
     if frame % max_loop == 0:
@@ -55,16 +79,24 @@ def update(frame):
         y = -y
         z = -z
 
-    # plot two lines with oppsite colors
-    ax.plot(x,y, color=plt.cm.viridis(norm_frame),alpha=0.5)
-    ax.plot(x,z, color=plt.cm.viridis(-norm_frame), alpha=0.5)
+    # add two lines with oppsite colors
+    add_line(x, y, plt.cm.viridis(norm_frame, alpha=0.5))
+    add_line(x, z, plt.cm.viridis(-norm_frame, alpha=0.5))
     # try inverting the axis
-    # ax.plot(z,x, color=plt.cm.viridis(-frame/100))
+    # add_line(z, x, plt.cm.viridis(-frame/100, alpha=0.5))
 
     # while the number of lines is greater than the number of lines we want
-    while len(ax.lines) > number_of_lines*norm_frame:
-        # remove the oldest line
-        ax.lines[0].remove()
+    while visible > 0 and visible > number_of_lines*norm_frame:
+        # forget the oldest line
+        oldest = (oldest + 1) % number_of_lines
+        visible -= 1
+
+    # hand the visible part of the ring to the collection, oldest first
+    order = (oldest + np.arange(visible)) % number_of_lines
+    lines.set_segments([segments[i] for i in order])
+    lines.set_color(colors[order])
+
+    return circle1, lines
 
-animation = FuncAnimation(fig, update, interval=10)
+animation = FuncAnimation(fig, update, init_func=init, interval=10, blit=True, cache_frame_data=False)
 plt.show()
\ No newline at end of file
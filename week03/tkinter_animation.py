@@ -1,20 +1,67 @@
 # a rendering of the sierpinsky fractal using tkinter canvas
-import random
+# points are drawn into a numpy image that is shown as a single canvas item,
+# so the canvas never fills up with thousands of oval items
+import time
 import tkinter as tk
 import numpy as np
+from PIL import Image, ImageTk
 width = 800
 height = 600
+
+# some parameters you can change!
+fps = 30 # frames per second
+points_per_second = 100 # how fast new points appear
+spread = 500 # points land up to spread/2 pixels away from the centre
+
 root = tk.Tk()
-canvas = tk.Canvas(root, width=width, height=height)
+canvas = tk.Canvas(root, width=width, height=height, highlightthickness=0)
 canvas.pack()
-canvas.create_rectangle(0, 0, width, height, fill='white')
 
+# off-screen buffer, white background
+buffer = np.full((height, width), 255, dtype=np.uint8)
+photo = ImageTk.PhotoImage(Image.fromarray(buffer))
+canvas.create_image(0, 0, image=photo, anchor='nw')
+
+rng = np.random.default_rng()
+
+# 3x3 pixel dot, like the 2 pixel ovals
+dot = np.array([(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)])
+
+
+def draw_points(pos, n):
+    """Draw n random points around pos into the buffer"""
+    points = np.round(pos + (rng.random((n, 2)) - 0.5) * spread).astype(int)
+
+    # every pixel of every dot, clipped to the image
+    x = (points[:, 0, None] + dot[:, 1]).ravel()
+    y = (points[:, 1, None] + dot[:, 0]).ravel()
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    buffer[y[inside], x[inside]] = 0
+
+
+pending = 0.0
+last_frame = time.perf_counter()
+
+
+def draw_frame(pos):
+    global pending, last_frame
+
+    # number of points due since the last frame, the fraction carries over
+    now = time.perf_counter()
+    pending += (now - last_frame) * points_per_second
+    last_frame = now
+    n = int(pending)
+    pending -= n
+
+    if n:
+        draw_points(pos, n)
+        # blit the whole buffer in one go
+        photo.paste(Image.fromarray(buffer))
 
-def draw_point(pos):
-    x, y = pos  + np.array([(random.random() - 0.5)*500 for _ in range(2)])
-    canvas.create_oval(x-1, y-1, x + 1, y + 1, fill='black')
-    canvas.after(10, draw_point, pos)
+    # schedule the next frame, minus the time this one took
+    delay = 1000 / fps - (time.perf_counter() - now) * 1000
+    canvas.after(max(int(delay), 1), draw_frame, pos)
 
-draw_point(np.array([width/2, height/2]))
+draw_frame(np.array([width/2, height/2]))
 
-root.mainloop()
\ No newline at end of file
+root.mainloop()
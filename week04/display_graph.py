@@ -1,14 +1,38 @@
+import os
+import datetime
 import streamlit as st
 import pandas as pd
 
-# load csv and display graph
-df = pd.read_csv("tides.csv")
-df["Date"] = pd.to_datetime(df["Date"])
-df.set_index("Date", inplace=True)
+# year-partitioned parquet dataset written by week02/tides_store.py
+dataset = os.getenv("TIDES_DATASET", "tides_dataset")
 
-# a date range to select a week 
-if date_range := st.date_input("Select a date range", [df.index.min(), df.index.max()]):
-    if len(date_range) == 2:
-        df = df.loc[date_range[0]:date_range[1]]
+if os.path.isdir(dataset):
+    # the partition directories tell us which years exist without reading any data
+    years = sorted(int(name.split('=', 1)[1]) for name in os.listdir(dataset) if name.startswith('year='))
+    start, end = datetime.date(years[0], 1, 1), datetime.date(years[-1], 12, 31)
 
-st.line_chart(df["Height"])
\ No newline at end of file
+    # a date range to select a week
+    if date_range := st.date_input("Select a date range", [start, end]):
+        if len(date_range) == 2:
+            start, end = date_range
+
+    # only read the two columns and the partitions inside the range
+    df = pd.read_parquet(dataset, columns=["datetime", "tide_level"], filters=[
+        ("year", ">=", start.year), ("year", "<=", end.year),
+        ("datetime", ">=", pd.Timestamp(start)), ("datetime", "<", pd.Timestamp(end) + pd.Timedelta(days=1)),
+    ])
+    df = df.rename(columns={"datetime": "Date", "tide_level": "Height"}).sort_values("Date")
+    df.set_index("Date", inplace=True)
+
+else:
+    # load csv and display graph
+    df = pd.read_csv("tides.csv")
+    df["Date"] = pd.to_datetime(df["Date"])
+    df.set_index("Date", inplace=True)
+
+    # a date range to select a week 
+    if date_range := st.date_input("Select a date range", [df.index.min(), df.index.max()]):
+        if len(date_range) == 2:
+            df = df.loc[date_range[0]:date_range[1]]
+
+st.line_chart(df["Height"])